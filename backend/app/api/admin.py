@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
@@ -5,6 +6,7 @@ from sqlalchemy import update
 from app.api.auth import UserManager, admin_user, get_user_manager
 from app.models.user import User
 from app.core.db import get_db
+from app.core.cache import cache_stats
 from app.schemas import UserRead, UserCreate, UserUpdate
 from uuid import UUID
 from typing import List
@@ -174,3 +176,20 @@ async def get_system_stats(
         "regular_users": regular_users,
         "system_access": True
     }
+
+
+@router.get("/cache/stats", response_model=dict)
+async def get_cache_stats(
+    current_user: User = Depends(admin_user)
+):
+    """Hit/miss counters of the shared caches (admin only)"""
+    return await asyncio.to_thread(cache_stats, ["embeddings", "ai_detection"])
+
+
+@router.get("/queues", response_model=dict)
+async def get_queue_stats(
+    current_user: User = Depends(admin_user)
+):
+    """Backlog of each pipeline stage queue and the workers consuming them (admin only)"""
+    from app.core.celery import queue_depths
+    return await asyncio.to_thread(queue_depths)
@@ -5,23 +5,31 @@ from sqlalchemy.ext.asyncio import AsyncSession
 import uuid
 import json
 
+from app.core.config import settings
 from app.core.db import get_db
 from app.models.user import User
 from app.api.auth import fastapi_users
-from app.services.ai_detection import AIDetectionService
-from app.services.plagiarism import PlagiarismService
+from app.services.ai_detection import AIDetectionService, get_ai_service
+from app.services.plagiarism import PlagiarismService, resolve_match_text
+from app.services.embedding import EmbeddingService
 from app.core.provider_router import ProviderRouter, ProviderType
 from typing import Dict, Any
 
 router = APIRouter()
-ai_service = AIDetectionService()
+# The AI detection service is created on first use (see get_ai_service) so importing
+# the routes doesn't load the model
 # PlagiarismService needs a session, so we instantiate it per request
 
 class AnalysisOptions(BaseModel):
-    provider: str = Field(default=ProviderType.LOCAL, description="AI detection provider (local, openai, together)")
+    provider: str = Field(default=ProviderType.LOCAL, description="AI detection provider (local, openai, together, cascade)")
     ai_threshold: float = Field(default=0.5, ge=0.0, le=1.0)
     check_plagiarism: bool = True
     check_ai: bool = True
+    prefilter: Optional[bool] = Field(default=None, description="MinHash/LSH candidate pruning; defaults to on for large batches")
+    prefilter_threshold: Optional[float] = Field(default=None, gt=0.0, le=1.0, description="Jaccard threshold for candidate pairs")
+    prefilter_num_perm: Optional[int] = Field(default=None, ge=16, le=512, description="MinHash permutations")
+    provider_policy: Optional[str] = Field(default=None, pattern="^(fail_fast|reroute)$", description="When the AI provider is failing: fail_fast or reroute")
+    fallback_provider: Optional[str] = Field(default=None, pattern="^(local|openai|together)$", description="Provider to reroute to (default: healthiest available)")
 
 class AnalysisResponse(BaseModel):
     batch_id: str
@@ -59,7 +67,12 @@ async def analyze_content(
         status="queued",
         analysis_type="mixed",
         ai_provider=opts.provider,
-        ai_threshold=opts.ai_threshold
+        ai_threshold=opts.ai_threshold,
+        prefilter=opts.prefilter,
+        prefilter_threshold=opts.prefilter_threshold,
+        prefilter_num_perm=opts.prefilter_num_perm,
+        provider_policy=opts.provider_policy,
+        fallback_provider=opts.fallback_provider
     )
     db.add(batch)
     
@@ -73,6 +86,7 @@ async def analyze_content(
             filename="input_text.txt",
             storage_path=f"{batch_id}/input_text.txt",
             text_content=text,
+            content_hash=EmbeddingService.hash_content(text),
             status="queued"
         )
         db.add(doc)
@@ -92,14 +106,16 @@ async def analyze_content(
         from io import BytesIO
         file_obj = BytesIO(content)
         file_obj.name = file.filename
-        text_content = await extract_text_from_file(file_obj)
+        # Files that need OCR are extracted later on the ocr worker queue
+        text_content = await extract_text_from_file(file_obj, ocr=not settings.OCR_IN_WORKER)
         
         doc = Document(
             batch_id=batch_id,
             filename=file.filename,
             storage_path=storage_path,
             text_content=text_content,
-            status="queued"
+            content_hash=EmbeddingService.hash_content(text_content) if text_content else None,
+            status="queued" if text_content is not None else "ocr_pending"
         )
         db.add(doc)
         docs_to_process.append(doc)
@@ -119,23 +135,42 @@ async def analyze_content(
     )
 
 @router.get("/ai-detection/health")
-async def ai_health_check():
+async def ai_health_check(ai_service: AIDetectionService = Depends(get_ai_service)):
     """Health check for AI detection service."""
+    from app.services.inference_queue import get_inference_queue
+
     health_status = ai_service.health_check()
-    return {"service": "ai_detection", "health": health_status}
+    return {"service": "ai_detection", "health": health_status, "inference_queue": get_inference_queue().stats()}
 
 @router.post("/ai-detection")
 async def detect_ai_only(
     text: str = Body(..., embed=True),
     provider: str = Body("local", embed=True),
     threshold: float = Body(0.5, embed=True),
-    user: User = Depends(fastapi_users.current_user())
+    user: User = Depends(fastapi_users.current_user()),
+    ai_service: AIDetectionService = Depends(get_ai_service)
 ):
     """
     Direct AI detection endpoint for text.
+    Local-model requests share a micro-batching queue; 429 is returned when it is saturated.
     """
+    from app.services.inference_queue import get_inference_queue, InferenceQueueFull
+
+    inference_queue = None
+    if provider.lower() in (ProviderType.LOCAL, ProviderType.CASCADE):
+        inference_queue = get_inference_queue()
+        try:
+            inference_queue.admit()
+        except InferenceQueueFull as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+
     try:
-        ai_result = ai_service.detect(text, provider=provider, threshold=threshold)
+        ai_result = await ai_service.detect_async(
+            text,
+            provider=provider,
+            threshold=threshold,
+            score_windows=inference_queue.score_threadsafe if inference_queue else None
+        )
         
         # Create temporary document to store result
         from app.models.document import Document
@@ -155,6 +190,9 @@ async def detect_ai_only(
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"AI detection failed: {str(e)}")
+    finally:
+        if inference_queue is not None:
+            inference_queue.release()
 
 @router.get("/batches")
 async def list_batches(
@@ -178,21 +216,95 @@ async def list_batches(
             "analysis_type": batch.analysis_type,
             "total_docs": batch.total_docs or 0,
             "processed_docs": batch.processed_docs or 0,
+            "reused_docs": batch.reused_docs or 0,
             "ai_provider": batch.ai_provider,
             "ai_threshold": batch.ai_threshold,
+            "ai_usage": (batch.meta_data or {}).get("ai_usage"),
             "created_at": batch.created_at.isoformat() if batch.created_at else None
         })
 
     return {"status": "ok", "data": data}
 
+@router.get("/batches/{batch_id}/events")
+async def stream_batch_events(
+    batch_id: uuid.UUID,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(fastapi_users.current_user())
+):
+    """
+    Server-Sent Events stream of a batch's progress, published by the workers to Redis.
+    Starts with a "snapshot" of the batch; the stream ends once the batch is completed or failed.
+    """
+    from app.models import Batch
+    from sqlalchemy import select
+    from fastapi.responses import StreamingResponse
+    from app.core.progress import ProgressSubscription, TERMINAL_STATUSES
+
+    if not settings.PROGRESS_EVENTS_ENABLED:
+        raise HTTPException(status_code=503, detail="Progress events are disabled")
+
+    # Subscribe before reading the batch, so no event is missed in between
+    subscription = ProgressSubscription(batch_id)
+    try:
+        await subscription.open()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Progress events unavailable: {str(e)}")
+
+    try:
+        batch_result = await db.execute(
+            select(Batch).where(Batch.id == batch_id, Batch.user_id == user.id)
+        )
+        batch = batch_result.scalar_one_or_none()
+        if not batch:
+            raise HTTPException(status_code=404, detail="Batch not found")
+        snapshot = {
+            "type": "snapshot",
+            "batch_id": str(batch.id),
+            "status": batch.status,
+            "processed_docs": batch.processed_docs or 0,
+            "total_docs": batch.total_docs or 0,
+            "reused_docs": batch.reused_docs or 0
+        }
+        # The stream never touches the database again; don't hold a connection for its lifetime
+        await db.close()
+    except BaseException:
+        await subscription.close()
+        raise
+
+    def sse(event: Dict[str, Any]) -> str:
+        return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+    async def events():
+        try:
+            yield sse(snapshot)
+            if snapshot["status"] in TERMINAL_STATUSES:
+                return
+            async for event in subscription.events(settings.PROGRESS_HEARTBEAT_SECONDS):
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield sse(event)
+                if event["type"] == "batch" and event.get("status") in TERMINAL_STATUSES:
+                    return
+        finally:
+            await subscription.close()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/batches/{batch_id}/results")
 async def get_batch_results(
     batch_id: uuid.UUID,
+    include_text: bool = True,
     db: AsyncSession = Depends(get_db),
     user: User = Depends(fastapi_users.current_user())
 ):
     """
     Get detailed results for a batch, including AI scores and plagiarism matches.
+    With include_text=false matches carry only character offsets, keeping the payload small.
     """
     from app.models import Batch, Document, Comparison
     from sqlalchemy import select
@@ -210,8 +322,8 @@ async def get_batch_results(
     )
     documents = documents_result.scalars().all()
     
-    results = []
     doc_b_alias = aliased(Document)
+    comparisons_by_doc = {}
     for doc in documents:
         comparisons_result = await db.execute(
             select(Comparison, doc_b_alias.filename.label("match_filename"))
@@ -219,14 +331,29 @@ async def get_batch_results(
             .where(Comparison.doc_a == doc.id)
             .order_by(Comparison.similarity.desc())
         )
-        comparisons = comparisons_result.all()
-        
+        comparisons_by_doc[doc.id] = comparisons_result.all()
+
+    # Matches store character offsets; slice the passages from the document texts here.
+    # Texts of matched documents from earlier batches are loaded in one query.
+    texts = {doc.id: doc.text_content for doc in documents}
+    missing_ids = {comp.doc_b for rows in comparisons_by_doc.values() for comp, _ in rows} - texts.keys()
+    if missing_ids and include_text:
+        texts_result = await db.execute(
+            select(Document.id, Document.text_content).where(Document.id.in_(missing_ids))
+        )
+        texts.update({row.id: row.text_content for row in texts_result.all()})
+
+    results = []
+    for doc in documents:
         plagiarism_details = []
-        for comp, match_filename in comparisons:
+        for comp, match_filename in comparisons_by_doc[doc.id]:
             plagiarism_details.append({
                 "similar_document": match_filename,
                 "similarity": comp.similarity,
-                "matches": comp.matches or []
+                "matches": (
+                    resolve_match_text(comp.matches, texts.get(doc.id), texts.get(comp.doc_b))
+                    if include_text else (comp.matches or [])
+                )
             })
 
         results.append({
@@ -0,0 +1,288 @@
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from app.core.config import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """Thread-safe in-process LRU with an optional per-entry TTL."""
+
+    def __init__(self, max_entries: int, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class RedisConnection:
+    """
+    Lazily connected Redis client. A failed connect is retried after a backoff that doubles up to
+    RETRY_MAX seconds, so a Redis blip at startup doesn't disable the caller until a restart.
+    """
+
+    RETRY_INITIAL = 2.0
+    RETRY_MAX = 300.0
+
+    def __init__(self, url: str, name: str):
+        self.url = url
+        self.name = name
+        self._client = None
+        self._retry_at = 0.0
+        self._backoff = self.RETRY_INITIAL
+        self._lock = threading.Lock()
+
+    def get(self):
+        """The client, or None while Redis is unavailable"""
+        if self._client is not None:
+            return self._client
+        with self._lock:
+            if self._client is not None or time.monotonic() < self._retry_at:
+                return self._client
+            try:
+                import redis
+                client = redis.Redis.from_url(self.url, socket_timeout=1.0, socket_connect_timeout=1.0)
+                client.ping()
+                self._client = client
+                self._backoff = self.RETRY_INITIAL
+                logger.info(f"{self.name} connected to Redis")
+            except Exception as e:
+                logger.warning(f"{self.name} disabled for {self._backoff:.0f}s, Redis unavailable: {e}")
+                self._retry_at = time.monotonic() + self._backoff
+                self._backoff = min(self._backoff * 2, self.RETRY_MAX)
+            return self._client
+
+
+class RedisCache:
+    """
+    Shared cache tier in Redis, bounded to max_entries.
+    A sorted set indexes keys by last access; the least recently used keys are
+    evicted when the bound is exceeded. Values are bytes.
+    """
+
+    def __init__(self, prefix: str, max_entries: int, ttl: Optional[int] = None, url: Optional[str] = None):
+        self.prefix = prefix
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.url = url or settings.REDIS_URL
+        self._connection = RedisConnection(self.url, f"Shared cache '{prefix}'")
+
+    @property
+    def index_key(self) -> str:
+        return f"{self.prefix}:lru"
+
+    @property
+    def stats_key(self) -> str:
+        return f"{self.prefix}:stats"
+
+    def _redis(self):
+        return self._connection.get()
+
+    def get_many(self, keys: list) -> Dict[str, bytes]:
+        client = self._redis()
+        if client is None or not keys:
+            return {}
+        try:
+            values = client.mget([f"{self.prefix}:{k}" for k in keys])
+            found = {k: v for k, v in zip(keys, values) if v is not None}
+            if found:
+                now = time.time()
+                client.zadd(self.index_key, {k: now for k in found})
+            return found
+        except Exception as e:
+            logger.warning(f"Shared cache '{self.prefix}' read failed: {e}")
+            return {}
+
+    def set_many(self, mapping: Dict[str, bytes]):
+        client = self._redis()
+        if client is None or not mapping:
+            return
+        try:
+            now = time.time()
+            pipe = client.pipeline(transaction=False)
+            for k, v in mapping.items():
+                pipe.set(f"{self.prefix}:{k}", v, ex=self.ttl or None)
+            pipe.zadd(self.index_key, {k: now for k in mapping})
+            pipe.zcard(self.index_key)
+            size = pipe.execute()[-1]
+
+            overflow = size - self.max_entries
+            if overflow > 0:
+                evicted = [k.decode() if isinstance(k, bytes) else k for k, _ in client.zpopmin(self.index_key, overflow)]
+                if evicted:
+                    client.delete(*[f"{self.prefix}:{k}" for k in evicted])
+        except Exception as e:
+            logger.warning(f"Shared cache '{self.prefix}' write failed: {e}")
+
+    def incr_stats(self, counts: Dict[str, int]):
+        client = self._redis()
+        if client is None:
+            return
+        try:
+            pipe = client.pipeline(transaction=False)
+            for field, amount in counts.items():
+                if amount:
+                    pipe.hincrby(self.stats_key, field, amount)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Shared cache '{self.prefix}' stats update failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        client = self._redis()
+        if client is None:
+            return {"available": False}
+        try:
+            raw = client.hgetall(self.stats_key)
+            counters = {k.decode(): int(v) for k, v in raw.items()}
+            return {"available": True, "entries": client.zcard(self.index_key), **counters}
+        except Exception as e:
+            return {"available": False, "error": str(e)}
+
+
+class TieredCache:
+    """
+    Content-addressed cache with an in-process LRU in front of an optional shared Redis tier.
+    encode/decode convert values to and from the bytes stored in Redis.
+    Keeps hit/miss counters per process and, when Redis is available, across processes.
+    get/set block on the Redis round-trips; async code uses aget/aset, which run them in a thread.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        local_entries: int,
+        shared_entries: int = 0,
+        ttl: Optional[int] = None,
+        encode: Callable[[Any], bytes] = None,
+        decode: Callable[[bytes], Any] = None
+    ):
+        self.name = name
+        self.local = LRUCache(local_entries, ttl=ttl)
+        self.shared = RedisCache(f"cache:{name}", shared_entries, ttl=ttl) if shared_entries > 0 else None
+        self.encode = encode or (lambda v: v)
+        self.decode = decode or (lambda b: b)
+        self.counters = {"local_hits": 0, "shared_hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        missing = []
+        for key in keys:
+            value = self.local.get(key)
+            if value is not None:
+                found[key] = value
+            else:
+                missing.append(key)
+
+        local_hits = len(found)
+        shared_hits = 0
+        if missing and self.shared is not None:
+            for key, raw in self.shared.get_many(missing).items():
+                value = self.decode(raw)
+                self.local.set(key, value)
+                found[key] = value
+                shared_hits += 1
+
+        counts = {"local_hits": local_hits, "shared_hits": shared_hits, "misses": len(keys) - len(found)}
+        with self._lock:
+            for field, amount in counts.items():
+                self.counters[field] += amount
+        if self.shared is not None:
+            self.shared.incr_stats(counts)
+        return found
+
+    def get(self, key: str) -> Any:
+        return self.get_many([key]).get(key)
+
+    def set_many(self, mapping: Dict[str, Any]):
+        for key, value in mapping.items():
+            self.local.set(key, value)
+        if self.shared is not None:
+            self.shared.set_many({key: self.encode(value) for key, value in mapping.items()})
+
+    def set(self, key: str, value: Any):
+        self.set_many({key: value})
+
+    async def aget_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """get_many for the event loop: with a shared tier, the lookup runs in a worker thread"""
+        if self.shared is None:
+            return self.get_many(keys)
+        return await asyncio.to_thread(self.get_many, list(keys))
+
+    async def aget(self, key: str) -> Any:
+        return (await self.aget_many([key])).get(key)
+
+    async def aset_many(self, mapping: Dict[str, Any]):
+        """set_many for the event loop: with a shared tier, the write runs in a worker thread"""
+        if self.shared is None:
+            self.set_many(mapping)
+        else:
+            await asyncio.to_thread(self.set_many, mapping)
+
+    async def aset(self, key: str, value: Any):
+        await self.aset_many({key: value})
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            process = dict(self.counters, entries=len(self.local))
+        lookups = process["local_hits"] + process["shared_hits"] + process["misses"]
+        process["hit_rate"] = round((lookups - process["misses"]) / lookups, 4) if lookups else 0.0
+        return {
+            "name": self.name,
+            "process": process,
+            "shared": self.shared.stats() if self.shared is not None else {"available": False}
+        }
+
+
+# One cache instance per name and process, shared by every service that uses it
+_caches: Dict[str, TieredCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(name: str, **kwargs) -> TieredCache:
+    """Return the process-wide cache for a name, creating it with kwargs on first use."""
+    with _caches_lock:
+        if name not in _caches:
+            _caches[name] = TieredCache(name, **kwargs)
+        return _caches[name]
+
+
+def cache_stats(names: Iterable[str]) -> Dict[str, Any]:
+    """Stats for the named caches; the shared tier is read even if this process never used the cache."""
+    stats = {}
+    for name in names:
+        if name in _caches:
+            stats[name] = _caches[name].stats()
+        else:
+            stats[name] = {"name": name, "process": None, "shared": RedisCache(f"cache:{name}", 0).stats()}
+    return stats
@@ -1,10 +1,32 @@
 import os
+import gc
+import logging
+from typing import Any, Dict
 from celery import Celery
+from kombu import Queue
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown, worker_shutdown
 from app.core.config import settings
+from app.core.model_registry import model_registry
+from app.core.worker_runtime import worker_runtime
+
+# Configure logging
+logger = logging.getLogger(__name__)
 
 
 app = Celery('plagiarism_detection')
 
+# One queue per pipeline stage, so each stage has its own worker pool and backlog;
+# batch planning and chord callbacks are light and stay on the default queue
+DEFAULT_QUEUE = "celery"
+STAGE_QUEUES = ("ocr", "embedding", "ai", "compare")
+# Models each stage needs in memory (comparisons fall back to encoding missing vectors)
+STAGE_MODELS = {
+    "ocr": (),
+    "embedding": ("embedding",),
+    "ai": ("ai_detection",),
+    "compare": ("embedding",),
+}
+
 # Configure Celery with explicit settings
 app.conf.update(
     broker_url=settings.CELERY_BROKER_URL,
@@ -15,11 +37,106 @@ app.conf.update(
     timezone='UTC',
     enable_utc=True,
     imports=("app.services.batch_processing",),
+    task_default_queue=DEFAULT_QUEUE,
+    task_queues=[Queue(name) for name in (DEFAULT_QUEUE,) + STAGE_QUEUES],
+    task_routes={
+        "app.services.batch_processing.extract_documents": {"queue": "ocr"},
+        "app.services.batch_processing.embed_documents": {"queue": "embedding"},
+        "app.services.batch_processing.detect_ai": {"queue": "ai"},
+        "app.services.batch_processing.compare_documents": {"queue": "compare"},
+    },
 )
 
+# Stage workers get that stage's pool defaults (command-line options still take precedence)
+if settings.CELERY_WORKER_STAGE:
+    if settings.CELERY_WORKER_STAGE not in STAGE_QUEUES:
+        raise ValueError(f"Unknown CELERY_WORKER_STAGE '{settings.CELERY_WORKER_STAGE}', expected one of {STAGE_QUEUES}")
+    _stage = settings.CELERY_WORKER_STAGE.upper()
+    app.conf.update(
+        worker_concurrency=getattr(settings, f"CELERY_{_stage}_CONCURRENCY"),
+        worker_prefetch_multiplier=getattr(settings, f"CELERY_{_stage}_PREFETCH"),
+        worker_max_tasks_per_child=getattr(settings, f"CELERY_{_stage}_MAX_TASKS_PER_CHILD"),
+    )
+
 # Windows can't use prefork reliably; use solo to avoid permission errors.
 if os.name == "nt":
     app.conf.worker_pool = "solo"
 
+
+def _preload_models():
+    """Load the models this worker's stage needs (all of them without a stage) into the process-wide registry."""
+    from app.services.embedding import get_embedding_service
+    from app.services.ai_detection import get_ai_service
+    models = STAGE_MODELS.get(settings.CELERY_WORKER_STAGE, ("embedding", "ai_detection"))
+    if "embedding" in models:
+        get_embedding_service()
+    if "ai_detection" in models:
+        get_ai_service()._load_local_model()
+
+
+def queue_depths() -> Dict[str, Any]:
+    """Messages waiting in each queue, and the queues each running worker consumes."""
+    depths: Dict[str, Any] = {}
+    try:
+        with app.connection_for_read() as connection:
+            # Redis transport: every queue is a list named after it
+            client = connection.default_channel.client
+            depths["queues"] = {name: client.llen(name) for name in (DEFAULT_QUEUE,) + STAGE_QUEUES}
+    except Exception as e:
+        depths["queues"] = {"error": str(e)}
+    try:
+        active = app.control.inspect(timeout=1.0).active_queues() or {}
+        depths["workers"] = {worker: [queue["name"] for queue in queues] for worker, queues in active.items()}
+    except Exception as e:
+        depths["workers"] = {"error": str(e)}
+    return depths
+
+
+@worker_init.connect
+def preload_models_in_parent(**kwargs):
+    # Runs in the parent before the pool forks, so every child inherits the weights
+    if not settings.PRELOAD_MODELS:
+        return
+    try:
+        _preload_models()
+        # Move preloaded objects out of the GC's reach so collections in the
+        # children don't touch (and copy) the shared pages
+        gc.freeze()
+        logger.info(f"Models preloaded in worker parent: {model_registry.stats()}")
+    except Exception as e:
+        logger.error(f"Model preload failed, children will load lazily: {e}")
+
+
+@worker_process_init.connect
+def preload_models_in_child(**kwargs):
+    # Runs in every pool child after the fork. The registry filled by preload_models_in_parent
+    # is inherited with its pages, so models loaded there are found and not loaded again. Only
+    # a model the parent failed to load is loaded here, as this child's private copy.
+    if not settings.PRELOAD_MODELS:
+        return
+    try:
+        _preload_models()
+        models = model_registry.stats()["models"]
+        inherited = [key for key, info in models.items() if info["shared_from_parent"]]
+        loaded = [key for key, info in models.items() if not info["shared_from_parent"]]
+        logger.info(f"Worker process {os.getpid()} models inherited from parent: {inherited}, loaded here: {loaded}")
+    except Exception as e:
+        logger.error(f"Model preload failed in worker process: {e}")
+
+@worker_process_init.connect
+def start_worker_runtime(**kwargs):
+    # Event loop and DB pool for this pool process, reused by every task it runs
+    worker_runtime.start()
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def stop_worker_runtime(**kwargs):
+    from app.services.embedding import close_embedding_pools
+
+    # No-op in a prefork parent, which never runs tasks
+    worker_runtime.shutdown()
+    close_embedding_pools()
+
 # Import tasks
 app.autodiscover_tasks(['app.services'])
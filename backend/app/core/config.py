@@ -31,11 +31,135 @@ class Settings(BaseSettings):
     USE_EXTERNAL_AI_DETECTION: bool = os.getenv("USE_EXTERNAL_AI_DETECTION", "false").lower() == "true"
     OPENAI_API_KEY: Optional[str] = os.getenv("OPENAI_API_KEY")
     TOGETHER_API_KEY: Optional[str] = os.getenv("TOGETHER_API_KEY")
+    # External providers: base URLs (point them at any OpenAI-compatible server), and per-provider
+    # connection pool, in-flight limit, request rate (req/s, 0 = unlimited) and retry backoff (seconds)
+    OPENAI_BASE_URL: Optional[str] = os.getenv("OPENAI_BASE_URL") or None
+    TOGETHER_BASE_URL: str = os.getenv("TOGETHER_BASE_URL", "https://api.together.xyz/v1")
+    EXTERNAL_AI_MAX_CONNECTIONS: int = int(os.getenv("EXTERNAL_AI_MAX_CONNECTIONS", "20"))
+    EXTERNAL_AI_MAX_CONCURRENCY: int = int(os.getenv("EXTERNAL_AI_MAX_CONCURRENCY", "8"))
+    EXTERNAL_AI_RATE_LIMIT: float = float(os.getenv("EXTERNAL_AI_RATE_LIMIT", "5"))
+    EXTERNAL_AI_BURST: float = float(os.getenv("EXTERNAL_AI_BURST", "10"))
+    EXTERNAL_AI_TIMEOUT: float = float(os.getenv("EXTERNAL_AI_TIMEOUT", "30"))
+    EXTERNAL_AI_MAX_RETRIES: int = int(os.getenv("EXTERNAL_AI_MAX_RETRIES", "4"))
+    EXTERNAL_AI_BACKOFF_BASE: float = float(os.getenv("EXTERNAL_AI_BACKOFF_BASE", "0.5"))
+    EXTERNAL_AI_BACKOFF_MAX: float = float(os.getenv("EXTERNAL_AI_BACKOFF_MAX", "20"))
+    # Raw AI scores per (provider, model, normalized text hash); thresholds are applied on read
+    AI_CACHE_ENABLED: bool = os.getenv("AI_CACHE_ENABLED", "true").lower() == "true"
+    AI_CACHE_LOCAL_ENTRIES: int = int(os.getenv("AI_CACHE_LOCAL_ENTRIES", "5000"))
+    AI_CACHE_SHARED_ENTRIES: int = int(os.getenv("AI_CACHE_SHARED_ENTRIES", "100000"))  # 0 disables Redis tier
+    AI_CACHE_TTL: int = int(os.getenv("AI_CACHE_TTL", str(7 * 24 * 3600)))
+    # Provider health: rolling window of requests, circuit breaker thresholds and cooldown (seconds),
+    # and what a batch does when its provider is unavailable ("fail_fast" or "reroute")
+    AI_PROVIDER_STATS_WINDOW: int = int(os.getenv("AI_PROVIDER_STATS_WINDOW", "100"))
+    AI_BREAKER_CONSECUTIVE_FAILURES: int = int(os.getenv("AI_BREAKER_CONSECUTIVE_FAILURES", "5"))
+    AI_BREAKER_ERROR_RATE: float = float(os.getenv("AI_BREAKER_ERROR_RATE", "0.5"))
+    AI_BREAKER_MIN_CALLS: int = int(os.getenv("AI_BREAKER_MIN_CALLS", "10"))
+    AI_BREAKER_COOLDOWN: float = float(os.getenv("AI_BREAKER_COOLDOWN", "30"))
+    AI_PROVIDER_POLICY: str = os.getenv("AI_PROVIDER_POLICY", "fail_fast")
+    # Packed external requests: documents are cut into CHUNK_TOKENS chunks (at most MAX_CHUNKS per
+    # document) and up to MAX_ITEMS chunks share one JSON-mode prompt of at most MAX_PROMPT_TOKENS
+    AI_PACKING_ENABLED: bool = os.getenv("AI_PACKING_ENABLED", "true").lower() == "true"
+    AI_PACK_MAX_PROMPT_TOKENS: int = int(os.getenv("AI_PACK_MAX_PROMPT_TOKENS", "8000"))
+    AI_PACK_MAX_ITEMS: int = int(os.getenv("AI_PACK_MAX_ITEMS", "16"))
+    AI_PACK_CHUNK_TOKENS: int = int(os.getenv("AI_PACK_CHUNK_TOKENS", "1000"))
+    AI_PACK_MAX_CHUNKS: int = int(os.getenv("AI_PACK_MAX_CHUNKS", "8"))
+    # Local classifier: token windows overlapping by STRIDE tokens, scored BATCH_SIZE at a time;
+    # longer documents are sampled down to MAX_WINDOWS evenly spaced windows
+    AI_DETECTION_BATCH_SIZE: int = int(os.getenv("AI_DETECTION_BATCH_SIZE", "16"))
+    AI_DETECTION_STRIDE: int = int(os.getenv("AI_DETECTION_STRIDE", "64"))
+    AI_DETECTION_MAX_WINDOWS: int = int(os.getenv("AI_DETECTION_MAX_WINDOWS", "64"))
+    # Cascade provider: statistical pre-screen settles scores outside [LOW, HIGH] (documents of at
+    # least MIN_WORDS) only when PRESCREEN_VERDICTS is on, its weights are uncalibrated; local model
+    # results within LOCAL_MARGIN of the threshold go to EXTERNAL_PROVIDER
+    AI_CASCADE_PRESCREEN_VERDICTS: bool = os.getenv("AI_CASCADE_PRESCREEN_VERDICTS", "false").lower() == "true"
+    AI_CASCADE_PRESCREEN_LOW: float = float(os.getenv("AI_CASCADE_PRESCREEN_LOW", "0.05"))
+    AI_CASCADE_PRESCREEN_HIGH: float = float(os.getenv("AI_CASCADE_PRESCREEN_HIGH", "0.95"))
+    AI_CASCADE_MIN_WORDS: int = int(os.getenv("AI_CASCADE_MIN_WORDS", "300"))
+    AI_CASCADE_LOCAL_MARGIN: float = float(os.getenv("AI_CASCADE_LOCAL_MARGIN", "0.2"))
+    AI_CASCADE_EXTERNAL_PROVIDER: str = os.getenv("AI_CASCADE_EXTERNAL_PROVIDER", "")  # "", "openai" or "together"
+    # Micro-batching queue for POST /ai-detection: windows per coalesced forward pass, how long
+    # to wait for more requests, and how many requests may be queued before answering 429
+    AI_QUEUE_MAX_BATCH: int = int(os.getenv("AI_QUEUE_MAX_BATCH", "32"))
+    AI_QUEUE_MAX_WAIT_MS: float = float(os.getenv("AI_QUEUE_MAX_WAIT_MS", "10"))
+    AI_QUEUE_MAX_PENDING: int = int(os.getenv("AI_QUEUE_MAX_PENDING", "64"))
+    # Adaptive sampling: stop once the Z-score interval of the mean clears the threshold
+    AI_DETECTION_ADAPTIVE: bool = os.getenv("AI_DETECTION_ADAPTIVE", "true").lower() == "true"
+    AI_ADAPTIVE_MIN_WINDOWS: int = int(os.getenv("AI_ADAPTIVE_MIN_WINDOWS", "4"))
+    AI_ADAPTIVE_Z: float = float(os.getenv("AI_ADAPTIVE_Z", "2.576"))  # 99% interval
+    
+    # Embedding settings
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+    # 0 disables the multi-process encode pool, -1 sizes it to the CPU count
+    EMBEDDING_POOL_PROCESSES: int = int(os.getenv("EMBEDDING_POOL_PROCESSES", "0"))
+    EMBEDDING_POOL_MIN_CHUNKS: int = int(os.getenv("EMBEDDING_POOL_MIN_CHUNKS", "256"))
+    # Chunk embedding cache: in-process LRU plus a size-bounded Redis tier shared by API and workers
+    EMBEDDING_CACHE_ENABLED: bool = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+    EMBEDDING_CACHE_LOCAL_ENTRIES: int = int(os.getenv("EMBEDDING_CACHE_LOCAL_ENTRIES", "20000"))
+    EMBEDDING_CACHE_SHARED_ENTRIES: int = int(os.getenv("EMBEDDING_CACHE_SHARED_ENTRIES", "200000"))  # 0 disables Redis tier
+    EMBEDDING_CACHE_TTL: int = int(os.getenv("EMBEDDING_CACHE_TTL", str(7 * 24 * 3600)))
+    
+    # Corpus search (pgvector chunk index across a user's batches)
+    CORPUS_SEARCH_ENABLED: bool = os.getenv("CORPUS_SEARCH_ENABLED", "true").lower() == "true"
+    CORPUS_SEARCH_K: int = int(os.getenv("CORPUS_SEARCH_K", "5"))
+    CORPUS_EF_SEARCH: int = int(os.getenv("CORPUS_EF_SEARCH", "64"))
+    # Owners with at most this many chunks are searched exactly instead of through the HNSW index
+    CORPUS_EXACT_MAX_ROWS: int = int(os.getenv("CORPUS_EXACT_MAX_ROWS", "50000"))
+    
+    # MinHash/LSH prefilter defaults (overridable per batch)
+    PREFILTER_MIN_DOCS: int = int(os.getenv("PREFILTER_MIN_DOCS", "50"))
+    PREFILTER_THRESHOLD: float = float(os.getenv("PREFILTER_THRESHOLD", "0.1"))
+    PREFILTER_NUM_PERM: int = int(os.getenv("PREFILTER_NUM_PERM", "128"))
+    PREFILTER_SHINGLE_SIZE: int = int(os.getenv("PREFILTER_SHINGLE_SIZE", "3"))
+    
+    # Winnowing fingerprints for verbatim copy detection
+    WINNOWING_ENABLED: bool = os.getenv("WINNOWING_ENABLED", "true").lower() == "true"
+    WINNOW_K: int = int(os.getenv("WINNOW_K", "30"))  # k-gram length in normalized characters
+    WINNOW_WINDOW: int = int(os.getenv("WINNOW_WINDOW", "20"))  # copies of >= K + WINDOW - 1 chars are always caught
+    WINNOW_MIN_MATCHES: int = int(os.getenv("WINNOW_MIN_MATCHES", "3"))
+    # Fingerprints found in more of the owner's documents are boilerplate (headers, license text) and skipped; 0 = no cap
+    WINNOW_MAX_DOC_FREQ: int = int(os.getenv("WINNOW_MAX_DOC_FREQ", "20"))
+    
+    # Load the parsing stack and AI model in the background after API startup (see /ready)
+    API_WARMUP_ENABLED: bool = os.getenv("API_WARMUP_ENABLED", "true").lower() == "true"
+    
+    # Load ML models in the Celery parent so prefork children share them copy-on-write
+    PRELOAD_MODELS: bool = os.getenv("PRELOAD_MODELS", "true").lower() == "true"
     
     # Celery settings
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://redis:6379/0")
     CELERY_BROKER_URL: str = os.getenv("CELERY_BROKER_URL", "redis://redis:6379/0")
     CELERY_RESULT_BACKEND: str = os.getenv("CELERY_RESULT_BACKEND", "redis://redis:6379/0")
+    # Connection pool of each worker process's long-lived async engine (one task at a time per process)
+    WORKER_DB_POOL_SIZE: int = int(os.getenv("WORKER_DB_POOL_SIZE", "2"))
+    WORKER_DB_MAX_OVERFLOW: int = int(os.getenv("WORKER_DB_MAX_OVERFLOW", "2"))
+    WORKER_DB_POOL_RECYCLE: int = int(os.getenv("WORKER_DB_POOL_RECYCLE", "1800"))  # seconds
+    # Documents per analysis/comparison task when a batch is fanned out across workers
+    BATCH_SHARD_SIZE: int = int(os.getenv("BATCH_SHARD_SIZE", "25"))
+    # Stage results are buffered and written in bulk once any of these is reached
+    BULK_FLUSH_DOCS: int = int(os.getenv("BULK_FLUSH_DOCS", "50"))
+    BULK_FLUSH_ROWS: int = int(os.getenv("BULK_FLUSH_ROWS", "2000"))
+    BULK_FLUSH_SECONDS: float = float(os.getenv("BULK_FLUSH_SECONDS", "5"))
+    # Per-document progress events on Redis pub/sub, streamed by GET /batches/{id}/events
+    PROGRESS_EVENTS_ENABLED: bool = os.getenv("PROGRESS_EVENTS_ENABLED", "true").lower() == "true"
+    PROGRESS_HEARTBEAT_SECONDS: float = float(os.getenv("PROGRESS_HEARTBEAT_SECONDS", "15"))
+    # Scanned PDFs and images are OCRed by the ocr worker queue instead of during upload
+    OCR_IN_WORKER: bool = os.getenv("OCR_IN_WORKER", "true").lower() == "true"
+    # Stage this worker serves: ocr, embedding, ai or compare; "" = every queue with Celery's defaults.
+    # Selects the pool defaults below and which models are preloaded (start it with -Q <stage>)
+    CELERY_WORKER_STAGE: str = os.getenv("CELERY_WORKER_STAGE", "")
+    # Per-stage pool defaults: concurrency, prefetch multiplier, tasks per child before it is recycled
+    CELERY_OCR_CONCURRENCY: int = int(os.getenv("CELERY_OCR_CONCURRENCY", "2"))
+    CELERY_OCR_PREFETCH: int = int(os.getenv("CELERY_OCR_PREFETCH", "1"))
+    CELERY_OCR_MAX_TASKS_PER_CHILD: int = int(os.getenv("CELERY_OCR_MAX_TASKS_PER_CHILD", "50"))
+    CELERY_EMBEDDING_CONCURRENCY: int = int(os.getenv("CELERY_EMBEDDING_CONCURRENCY", "2"))
+    CELERY_EMBEDDING_PREFETCH: int = int(os.getenv("CELERY_EMBEDDING_PREFETCH", "1"))
+    CELERY_EMBEDDING_MAX_TASKS_PER_CHILD: int = int(os.getenv("CELERY_EMBEDDING_MAX_TASKS_PER_CHILD", "200"))
+    CELERY_AI_CONCURRENCY: int = int(os.getenv("CELERY_AI_CONCURRENCY", "2"))
+    CELERY_AI_PREFETCH: int = int(os.getenv("CELERY_AI_PREFETCH", "1"))
+    CELERY_AI_MAX_TASKS_PER_CHILD: int = int(os.getenv("CELERY_AI_MAX_TASKS_PER_CHILD", "200"))
+    CELERY_COMPARE_CONCURRENCY: int = int(os.getenv("CELERY_COMPARE_CONCURRENCY", "4"))
+    CELERY_COMPARE_PREFETCH: int = int(os.getenv("CELERY_COMPARE_PREFETCH", "2"))
+    CELERY_COMPARE_MAX_TASKS_PER_CHILD: int = int(os.getenv("CELERY_COMPARE_MAX_TASKS_PER_CHILD", "500"))
 
 
 settings = Settings()
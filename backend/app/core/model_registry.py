@@ -0,0 +1,93 @@
+import os
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """
+    Process-wide registry of ML models.
+    Each model is loaded lazily, once per process, and shared by every service that asks
+    for it. Models loaded in a Celery parent before forking are inherited by the prefork
+    children copy-on-write.
+    """
+
+    def __init__(self):
+        self._models: Dict[str, Any] = {}
+        self._info: Dict[str, Dict[str, Any]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._registry_lock = threading.Lock()
+
+    def get(self, key: str, loader: Callable[[], Any]) -> Any:
+        """Return the model registered under key, loading it with loader on first use."""
+        if key in self._models:
+            return self._models[key]
+
+        with self._registry_lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            if key not in self._models:
+                started = time.perf_counter()
+                model = loader()
+                self._models[key] = model
+                self._info[key] = {
+                    "load_seconds": round(time.perf_counter() - started, 3),
+                    "loaded_in_pid": os.getpid(),
+                    "parameter_bytes": _parameter_bytes(model),
+                }
+                logger.info(f"Model '{key}' loaded: {self._info[key]}")
+        return self._models[key]
+
+    def sentence_transformer(self, model_name: str):
+        def load():
+            from sentence_transformers import SentenceTransformer
+            return SentenceTransformer(model_name)
+        return self.get(f"sentence-transformer:{model_name}", load)
+
+    def text_classifier(self, model_name: str):
+        def load():
+            from transformers import pipeline
+            return pipeline("text-classification", model=model_name)
+        return self.get(f"text-classification:{model_name}", load)
+
+    def is_loaded(self, key: str) -> bool:
+        return key in self._models
+
+    def stats(self) -> Dict[str, Any]:
+        """Loaded models with their parameter memory, plus the process's peak RSS."""
+        models = {
+            key: dict(info, shared_from_parent=info["loaded_in_pid"] != os.getpid())
+            for key, info in self._info.items()
+        }
+        return {
+            "pid": os.getpid(),
+            "models": models,
+            "total_parameter_bytes": sum(info["parameter_bytes"] for info in self._info.values()),
+            "max_rss_bytes": _max_rss_bytes(),
+        }
+
+
+def _parameter_bytes(model) -> int:
+    """Bytes held by the parameters and buffers of a torch model (or a pipeline's model)."""
+    module = getattr(model, "model", model)
+    try:
+        tensors = list(module.parameters()) + list(module.buffers())
+        return int(sum(t.numel() * t.element_size() for t in tensors))
+    except Exception:
+        return 0
+
+
+def _max_rss_bytes() -> int:
+    try:
+        import resource
+        # ru_maxrss is in kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except Exception:
+        return 0
+
+
+model_registry = ModelRegistry()
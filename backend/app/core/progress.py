@@ -0,0 +1,94 @@
+import json
+import time
+import logging
+from typing import Any, AsyncIterator, Dict, Optional
+
+from app.core.cache import RedisConnection
+from app.core.config import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Events that end a batch's stream
+TERMINAL_STATUSES = ("completed", "failed")
+
+
+def channel(batch_id) -> str:
+    return f"batch-events:{batch_id}"
+
+
+class ProgressPublisher:
+    """
+    Publishes batch progress events to Redis pub/sub, one channel per batch.
+    Events are fire-and-forget: nobody listening, or Redis being down, never fails a task.
+    """
+
+    def __init__(self, url: Optional[str] = None):
+        self.url = url or settings.REDIS_URL
+        self._connection = RedisConnection(self.url, "Progress events")
+
+    def publish(self, batch_id, event_type: str, **data):
+        """Publish {"type": event_type, "batch_id": ..., **data} on the batch's channel"""
+        if not settings.PROGRESS_EVENTS_ENABLED:
+            return
+        client = self._connection.get()
+        if client is None:
+            return
+        try:
+            event = {"type": event_type, "batch_id": str(batch_id), **data}
+            client.publish(channel(batch_id), json.dumps(event, default=str))
+        except Exception as e:
+            logger.warning(f"Progress event for batch {batch_id} not published: {e}")
+
+
+class ProgressSubscription:
+    """
+    Subscription to one batch's progress events, for the streaming endpoint.
+    Subscribe before reading the batch's current state, so no event falls in between.
+    """
+
+    def __init__(self, batch_id, url: Optional[str] = None):
+        self.batch_id = batch_id
+        self.url = url or settings.REDIS_URL
+        self._client = None
+        self._pubsub = None
+
+    async def open(self):
+        import redis.asyncio as aioredis
+        self._client = aioredis.Redis.from_url(self.url, socket_connect_timeout=1.0)
+        self._pubsub = self._client.pubsub()
+        try:
+            await self._pubsub.subscribe(channel(self.batch_id))
+        except Exception:
+            await self.close()
+            raise
+
+    async def events(self, heartbeat: float) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """Yield events as they arrive, and None after heartbeat seconds without one"""
+        last = time.monotonic()
+        while True:
+            message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=heartbeat)
+            if message is not None:
+                last = time.monotonic()
+                try:
+                    yield json.loads(message["data"])
+                except (TypeError, ValueError):
+                    logger.warning(f"Malformed progress event for batch {self.batch_id}: {message['data']!r}")
+            elif time.monotonic() - last >= heartbeat:
+                last = time.monotonic()
+                yield None
+
+    async def close(self):
+        try:
+            if self._pubsub is not None:
+                await self._pubsub.aclose()
+            if self._client is not None:
+                await self._client.aclose()
+        except Exception as e:
+            logger.warning(f"Progress subscription for batch {self.batch_id} not closed cleanly: {e}")
+        finally:
+            self._pubsub = None
+            self._client = None
+
+
+progress = ProgressPublisher()
@@ -1,8 +1,16 @@
 import os
+import time
+import random
+import asyncio
+import threading
+import importlib.util
+from collections import deque
 from enum import Enum
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 import logging
 
+from app.core.config import settings
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -10,6 +18,161 @@ class ProviderType(str, Enum):
     LOCAL = "local"
     OPENAI = "openai"
     TOGETHER = "together"
+    CASCADE = "cascade"
+
+class ProviderUnavailableError(Exception):
+    """Raised without calling the provider while its circuit breaker is open."""
+
+
+class ProviderHealth:
+    """
+    Rolling latency/error statistics and circuit breaker of one provider.
+    The breaker opens after AI_BREAKER_CONSECUTIVE_FAILURES failures in a row, or when the
+    error rate over the rolling window reaches AI_BREAKER_ERROR_RATE; after
+    AI_BREAKER_COOLDOWN seconds a single probe request is let through (half-open)
+    and its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, window: int = None):
+        self.window = window or settings.AI_PROVIDER_STATS_WINDOW
+        self._calls = deque(maxlen=self.window)  # (ok, latency seconds, status code)
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.trips = 0
+        self.rejected = 0
+        self.quota: Dict[str, Any] = {}
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now; moves an expired open breaker to half-open."""
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= settings.AI_BREAKER_COOLDOWN:
+                self.state = "half_open"
+                self._probe_in_flight = False
+            if self.state == "closed":
+                return True
+            if self.state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, ok: bool, latency: float, status_code: Optional[int] = None):
+        with self._lock:
+            self._calls.append((ok, latency, status_code))
+            self.consecutive_failures = 0 if ok else self.consecutive_failures + 1
+            if self.state == "half_open":
+                self._probe_in_flight = False
+                if ok:
+                    self.state = "closed"
+                    self._calls.clear()
+                else:
+                    self._open()
+                return
+            if self.state == "closed" and not ok and self._should_trip():
+                self._open()
+
+    def release_probe(self):
+        """The half-open probe was abandoned without an outcome (e.g. cancelled); let the next call probe."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_quota(self, headers):
+        """Keep the provider's rate-limit headers (x-ratelimit-remaining-requests etc.) when it sends them."""
+        quota = {k.lower(): v for k, v in headers.items() if k.lower().startswith("x-ratelimit-")}
+        if quota:
+            with self._lock:
+                self.quota = quota
+
+    def _should_trip(self) -> bool:
+        if self.consecutive_failures >= settings.AI_BREAKER_CONSECUTIVE_FAILURES:
+            return True
+        if len(self._calls) < settings.AI_BREAKER_MIN_CALLS:
+            return False
+        failures = sum(1 for ok, _, _ in self._calls if not ok)
+        return failures / len(self._calls) >= settings.AI_BREAKER_ERROR_RATE
+
+    def _open(self):
+        self.state = "open"
+        self.opened_at = time.monotonic()
+        self.trips += 1
+        logger.warning(f"Circuit breaker opened after {self.consecutive_failures} consecutive failures")
+
+    @property
+    def healthy(self) -> bool:
+        return self.state == "closed"
+
+    def latency_p95(self) -> Optional[float]:
+        with self._lock:
+            latencies = sorted(latency for ok, latency, _ in self._calls if ok)
+        if not latencies:
+            return None
+        return latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = list(self._calls)
+            quota = dict(self.quota)
+        latencies = sorted(latency for ok, latency, _ in calls if ok)
+        failures = sum(1 for ok, _, _ in calls if not ok)
+
+        def percentile(q):
+            return round(latencies[min(int(len(latencies) * q), len(latencies) - 1)], 3) if latencies else None
+
+        return {
+            "state": self.state,
+            "calls": len(calls),
+            "error_rate": round(failures / len(calls), 4) if calls else 0.0,
+            "rate_limited": sum(1 for _, _, status in calls if status == 429),
+            "latency_p50": percentile(0.5),
+            "latency_p95": percentile(0.95),
+            "consecutive_failures": self.consecutive_failures,
+            "trips": self.trips,
+            "rejected": self.rejected,
+            "quota": quota,
+        }
+
+
+class TokenBucket:
+    """
+    Request rate limiter: refills `rate` tokens per second up to `capacity`.
+    Safe to share between event loops and threads; callers wait with asyncio.sleep.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take one token, possibly on credit. Returns how long the caller must wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class _ProviderPool:
+    """Async client and concurrency limit of one provider, bound to the event loop that created them."""
+
+    def __init__(self, client, loop: asyncio.AbstractEventLoop, max_concurrency: int):
+        self.client = client
+        self.loop = loop
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
 
 class ProviderRouter:
     """
@@ -17,17 +180,27 @@ class ProviderRouter:
     Validates availability and logs usage.
     """
     
+    BASE_URLS = {
+        ProviderType.OPENAI: settings.OPENAI_BASE_URL,
+        ProviderType.TOGETHER: settings.TOGETHER_BASE_URL,
+    }
+    RETRY_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
     def __init__(self):
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
         self.together_api_key = os.getenv("TOGETHER_API_KEY")
+        self._pools: Dict[Tuple[str, asyncio.AbstractEventLoop], _ProviderPool] = {}
+        self._buckets = {
+            provider: TokenBucket(settings.EXTERNAL_AI_RATE_LIMIT, settings.EXTERNAL_AI_BURST)
+            for provider in self.BASE_URLS
+        }
+        self.health = {provider: ProviderHealth() for provider in self.BASE_URLS}
         
-        # Check for local model availability (simplified check)
-        self.local_model_available = True 
-        try:
-            import transformers
-            import torch
-        except ImportError:
-            self.local_model_available = False
+        # Check for local model availability without importing the (slow) packages
+        self.local_model_available = all(
+            importlib.util.find_spec(name) is not None for name in ("transformers", "torch")
+        )
+        if not self.local_model_available:
             logger.warning("Local model dependencies (transformers, torch) not found.")
 
     def validate_provider(self, provider: str) -> str:
@@ -51,6 +224,10 @@ class ProviderRouter:
             if not self.local_model_available:
                 raise ValueError("Local provider requested but dependencies are missing.")
             return ProviderType.LOCAL
+
+        elif provider == ProviderType.CASCADE:
+            # The statistical pre-screen always runs; later stages are used when available
+            return ProviderType.CASCADE
             
         else:
             raise ValueError(f"Unknown provider: {provider}. Valid options: {', '.join([p.value for p in ProviderType])}")
@@ -66,3 +243,145 @@ class ProviderRouter:
     def log_usage(self, provider: str, operation: str, details: Dict[str, Any] = None):
         """Logs provider usage for audit and debugging."""
         logger.info(f"Provider Usage: {provider} | Operation: {operation} | Details: {details or {}}")
+
+    def is_healthy(self, provider: str) -> bool:
+        """Local is always healthy when installed; external providers need a key and a closed breaker."""
+        if provider == ProviderType.LOCAL:
+            return self.local_model_available
+        health = self.health.get(provider)
+        return health is not None and self.get_api_key(provider) is not None and health.healthy
+
+    def choose_fallback(self, failed_provider: str, preferred: Optional[str] = None) -> Optional[str]:
+        """
+        Provider to reroute to when failed_provider is unavailable: the preferred one if healthy,
+        otherwise the healthy external provider with the lowest p95 latency, otherwise local.
+        """
+        if preferred and preferred != failed_provider and self.is_healthy(preferred):
+            return ProviderType(preferred)
+        candidates = [p for p in self.BASE_URLS if p != failed_provider and self.is_healthy(p)]
+        if candidates:
+            return min(candidates, key=lambda p: self.health[p].latency_p95() or 0.0)
+        if failed_provider != ProviderType.LOCAL and self.local_model_available:
+            return ProviderType.LOCAL
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        """Rolling health of every external provider, as shown on /ai-detection/health."""
+        return {
+            ProviderType(provider).value: dict(health.stats(), configured=self.get_api_key(provider) is not None)
+            for provider, health in self.health.items()
+        }
+
+    def _pool(self, provider: str) -> _ProviderPool:
+        """
+        Long-lived pooled client for the provider on the running event loop.
+        httpx connections can't cross event loops, so each loop gets its own pool, kept until
+        aclose() is awaited on that loop; a pool is never replaced under a loop still using it.
+        """
+        loop = asyncio.get_running_loop()
+        pool = self._pools.get((provider, loop))
+        if pool is None:
+            self._drop_closed_loops()
+            import httpx
+            from openai import AsyncOpenAI
+
+            http_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(settings.EXTERNAL_AI_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=settings.EXTERNAL_AI_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.EXTERNAL_AI_MAX_CONNECTIONS
+                )
+            )
+            client = AsyncOpenAI(
+                api_key=self.get_api_key(provider),
+                base_url=self.BASE_URLS.get(provider),
+                http_client=http_client,
+                max_retries=0  # retries are handled in chat_completion with jitter
+            )
+            pool = _ProviderPool(client, loop, settings.EXTERNAL_AI_MAX_CONCURRENCY)
+            self._pools[(provider, loop)] = pool
+        return pool
+
+    def _drop_closed_loops(self):
+        # Connections can only be closed on their own loop; once it is closed they are beyond reach
+        for (provider, loop), pool in list(self._pools.items()):
+            if loop.is_closed():
+                del self._pools[(provider, loop)]
+                logger.warning(
+                    f"{ProviderType(provider).value} client pool dropped: its event loop closed without router.aclose()"
+                )
+
+    async def chat_completion(self, provider: str, **kwargs):
+        """
+        Chat completion on the provider's pooled client, limited by its concurrency
+        semaphore and token bucket. 429, 5xx and connection errors are retried with
+        exponential backoff and full jitter, honouring Retry-After when present.
+        Every attempt feeds the provider's health stats except other 4xx responses: those
+        are the caller's, neither held against the provider nor counted as successes.
+        While its circuit breaker is open, ProviderUnavailableError is raised without
+        sending anything.
+        """
+        from openai import APIConnectionError, APIStatusError
+
+        pool = self._pool(provider)
+        bucket = self._buckets[provider]
+        health = self.health[provider]
+        attempt = 0
+        while True:
+            if not health.allow():
+                raise ProviderUnavailableError(f"{ProviderType(provider).value} circuit breaker is open")
+            # Every path after allow() must record an outcome or release the half-open probe,
+            # otherwise the breaker would wait for the probe forever
+            started = time.monotonic()
+            try:
+                await bucket.acquire()
+                started = time.monotonic()
+                async with pool.semaphore:
+                    raw = await pool.client.chat.completions.with_raw_response.create(**kwargs)
+                result = raw.parse()
+                health.record(True, time.monotonic() - started, raw.status_code)
+                health.record_quota(raw.headers)
+                return result
+            except (APIStatusError, APIConnectionError) as e:
+                status_code = getattr(e, "status_code", None)
+                retryable = status_code is None or status_code in self.RETRY_STATUS_CODES
+                if getattr(e, "response", None) is not None:
+                    health.record_quota(e.response.headers)
+                if not retryable:
+                    # The caller's fault (bad request, auth, payload too large): says nothing
+                    # about the provider's health, so it is neither a failure nor a successful probe
+                    health.release_probe()
+                    raise
+                health.record(False, time.monotonic() - started, status_code)
+                if attempt >= settings.EXTERNAL_AI_MAX_RETRIES:
+                    raise
+                delay = random.uniform(0, min(settings.EXTERNAL_AI_BACKOFF_MAX, settings.EXTERNAL_AI_BACKOFF_BASE * 2 ** attempt))
+                retry_after = self._retry_after(e)
+                if retry_after is not None:
+                    delay = max(delay, retry_after)
+                attempt += 1
+                logger.warning(f"{ProviderType(provider).value} request failed ({status_code or type(e).__name__}), retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                health.release_probe()
+                raise
+            except Exception:
+                health.record(False, time.monotonic() - started)
+                raise
+
+    @staticmethod
+    def _retry_after(error) -> Optional[float]:
+        response = getattr(error, "response", None)
+        value = response.headers.get("retry-after") if response is not None else None
+        try:
+            return min(float(value), settings.EXTERNAL_AI_BACKOFF_MAX) if value is not None else None
+        except ValueError:
+            return None
+
+    async def aclose(self):
+        """Close the pooled clients that belong to the running event loop."""
+        loop = asyncio.get_running_loop()
+        for key, pool in list(self._pools.items()):
+            if pool.loop is loop:
+                del self._pools[key]
+                await pool.client.close()
@@ -0,0 +1,35 @@
+from sqlalchemy import text
+
+# create_all only creates missing tables; columns and indexes added to existing tables are
+# applied here. Every statement is idempotent, so this runs on each startup.
+SCHEMA_UPGRADES = (
+    # Per-batch MinHash/LSH prefilter settings
+    "ALTER TABLE batches ADD COLUMN IF NOT EXISTS prefilter BOOLEAN",
+    "ALTER TABLE batches ADD COLUMN IF NOT EXISTS prefilter_threshold DOUBLE PRECISION",
+    "ALTER TABLE batches ADD COLUMN IF NOT EXISTS prefilter_num_perm INTEGER",
+    # Documents served from earlier results by content hash
+    "ALTER TABLE batches ADD COLUMN IF NOT EXISTS reused_docs INTEGER DEFAULT 0",
+    # Per-batch policy when the AI provider's circuit breaker is open
+    "ALTER TABLE batches ADD COLUMN IF NOT EXISTS provider_policy VARCHAR",
+    "ALTER TABLE batches ADD COLUMN IF NOT EXISTS fallback_provider VARCHAR",
+    # Processing metadata, e.g. external provider token usage
+    "ALTER TABLE batches ADD COLUMN IF NOT EXISTS meta_data JSONB",
+    # Chunk-level corpus index on the existing embeddings table
+    "ALTER TABLE embeddings ADD COLUMN IF NOT EXISTS chunk_index INTEGER",
+    "ALTER TABLE embeddings ADD COLUMN IF NOT EXISTS start_offset INTEGER",
+    "ALTER TABLE embeddings ADD COLUMN IF NOT EXISTS end_offset INTEGER",
+    "ALTER TABLE embeddings ADD COLUMN IF NOT EXISTS owner_id UUID",
+    "ALTER TABLE embeddings ADD COLUMN IF NOT EXISTS batch_id UUID REFERENCES batches(id)",
+    "ALTER TABLE embeddings ADD COLUMN IF NOT EXISTS model_name VARCHAR",
+    "CREATE INDEX IF NOT EXISTS ix_embeddings_file_id ON embeddings (file_id)",
+    "CREATE INDEX IF NOT EXISTS ix_embeddings_owner_id ON embeddings (owner_id)",
+    "CREATE INDEX IF NOT EXISTS ix_embeddings_batch_id ON embeddings (batch_id)",
+    "CREATE INDEX IF NOT EXISTS ix_embeddings_vector_hnsw ON embeddings "
+    "USING hnsw (vector vector_cosine_ops) WITH (m = 16, ef_construction = 64)",
+)
+
+
+async def upgrade_schema(conn):
+    """Apply SCHEMA_UPGRADES on an open connection, after Base.metadata.create_all"""
+    for statement in SCHEMA_UPGRADES:
+        await conn.execute(text(statement))
@@ -0,0 +1,84 @@
+import time
+import logging
+import importlib
+import threading
+from typing import Any, Dict, Optional
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Modules the upload path needs; importing them up front keeps the first upload fast
+PARSER_MODULES = ("pdfminer.high_level", "docx", "PIL.Image", "pytesseract", "pdf2image")
+
+
+class WarmupState:
+    """
+    Tracks API cold start: how long the app took to import and start, and the
+    background warm-up that loads the heavy parsing stack and models afterwards.
+    """
+
+    def __init__(self):
+        self.status = "pending"  # pending | disabled | running | ready | failed
+        self.import_seconds: Optional[float] = None
+        self.startup_seconds: Optional[float] = None
+        self.steps: Dict[str, Dict[str, Any]] = {}
+        self._started_at: Optional[float] = None
+        self._finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.status in ("ready", "failed", "disabled")
+
+    def _step(self, name: str, fn):
+        started = time.perf_counter()
+        try:
+            fn()
+            result = {"status": "ok"}
+        except Exception as e:
+            logger.warning(f"Warm-up step '{name}' failed: {e}")
+            result = {"status": "failed", "error": str(e)}
+        result["seconds"] = round(time.perf_counter() - started, 3)
+        with self._lock:
+            self.steps[name] = result
+
+    def run(self):
+        """Import the parsing stack and load the AI detection model. Blocking; run it off the event loop."""
+        from app.services.ai_detection import get_ai_service
+
+        self.status = "running"
+        self._started_at = time.perf_counter()
+        for module in PARSER_MODULES:
+            self._step(f"import:{module}", lambda module=module: importlib.import_module(module))
+
+        def load_ai_model():
+            service = get_ai_service()
+            if service.router.local_model_available:
+                service._load_local_model()
+                if service.classifier is None:
+                    raise RuntimeError("local AI detection model failed to load")
+
+        self._step("model:ai_detection", load_ai_model)
+        self._finished_at = time.perf_counter()
+        failed = any(step["status"] == "failed" for step in self.steps.values())
+        self.status = "failed" if failed else "ready"
+        logger.info(f"Warm-up {self.status}: {self.as_dict()}")
+
+    def as_dict(self) -> Dict[str, Any]:
+        warmup_seconds = None
+        if self._started_at is not None:
+            end = self._finished_at if self._finished_at is not None else time.perf_counter()
+            warmup_seconds = round(end - self._started_at, 3)
+        with self._lock:
+            steps = dict(self.steps)
+        return {
+            "status": self.status,
+            "ready": self.ready,
+            "import_seconds": self.import_seconds,
+            "startup_seconds": self.startup_seconds,
+            "warmup_seconds": warmup_seconds,
+            "steps": steps
+        }
+
+
+warmup_state = WarmupState()
@@ -0,0 +1,83 @@
+import os
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Coroutine, Optional
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.config import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class WorkerRuntime:
+    """
+    Event loop and async DB engine that live as long as a Celery worker process.
+    Tasks run their coroutines on the same loop, so pooled database connections (and the
+    provider router's HTTP pools, which are bound to a loop) are reused across tasks
+    instead of being set up and torn down by every asyncio.run.
+    Started in each pool process after the fork; a process that was never started
+    (solo pool, eager tasks, scripts) starts it on first use.
+    """
+
+    def __init__(self):
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.engine: Optional[AsyncEngine] = None
+        self.session_factory = None
+        self._pid: Optional[int] = None
+
+    @property
+    def started(self) -> bool:
+        # A forked child must not reuse the parent's loop or connections
+        return self.loop is not None and self._pid == os.getpid()
+
+    def start(self):
+        if self.started:
+            return
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.engine = create_async_engine(
+            settings.DATABASE_URL,
+            echo=False,
+            pool_size=settings.WORKER_DB_POOL_SIZE,
+            max_overflow=settings.WORKER_DB_MAX_OVERFLOW,
+            pool_recycle=settings.WORKER_DB_POOL_RECYCLE,
+            pool_pre_ping=True,
+        )
+        self.session_factory = sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+        self._pid = os.getpid()
+        logger.info(f"Worker runtime started in process {self._pid}")
+
+    def run(self, coro: Coroutine) -> Any:
+        """Run a coroutine to completion on the worker loop (the Celery equivalent of asyncio.run)."""
+        self.start()
+        return self.loop.run_until_complete(coro)
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[AsyncSession]:
+        """A session on the worker's engine; the connection goes back to the pool afterwards."""
+        async with self.session_factory() as session:
+            yield session
+
+    def shutdown(self):
+        """Close the loop-bound clients, the engine's connections and the loop itself."""
+        if not self.started:
+            return
+        from app.services.ai_detection import get_ai_service
+
+        try:
+            self.loop.run_until_complete(get_ai_service().router.aclose())
+            self.loop.run_until_complete(self.engine.dispose())
+            self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+        except Exception as e:
+            logger.warning(f"Worker runtime shutdown incomplete: {e}")
+        finally:
+            self.loop.close()
+            self.loop = None
+            self.engine = None
+            self.session_factory = None
+            logger.info(f"Worker runtime stopped in process {self._pid}")
+
+
+worker_runtime = WorkerRuntime()
@@ -1,11 +1,20 @@
+import time
+_import_started = time.perf_counter()
+
 import loguru
 import os
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
 from app.api.auth import router as auth_router
 from app.api.users import router as users_router
 from app.api.admin import router as admin_router
 from app.core.db import async_engine
+from app.core.config import settings
+from app.core.warmup import warmup_state
+from app.core.schema import upgrade_schema
 from app.models.base import Base
 
 
@@ -32,12 +41,18 @@ app.include_router(users_router, prefix="/api/users", tags=["users"])
 app.include_router(admin_router, prefix="/api", tags=["admin"])
 app.include_router(v1_routes.router, prefix="/api/v1", tags=["analysis"])
 
+warmup_state.import_seconds = round(time.perf_counter() - _import_started, 3)
+_warmup_task = None
+
 
 @app.on_event("startup")
 async def startup_event():
     loguru.logger.info("Starting up...")
     async with async_engine.begin() as conn:
+        # pgvector must exist before the Vector columns and HNSW index are created
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
         await conn.run_sync(Base.metadata.create_all)
+        await upgrade_schema(conn)
     
     # Seed the database with initial data
     try:
@@ -46,14 +61,38 @@ async def startup_event():
     except Exception as e:
         loguru.logger.error(f"Database seeding failed: {e}")
 
+    warmup_state.startup_seconds = round(time.perf_counter() - _import_started, 3)
+    loguru.logger.info(f"Cold start: import {warmup_state.import_seconds}s, startup {warmup_state.startup_seconds}s")
+
+    # Heavy parsers and models load in the background; /ready reports progress
+    global _warmup_task
+    if settings.API_WARMUP_ENABLED:
+        _warmup_task = asyncio.create_task(asyncio.to_thread(warmup_state.run))
+    else:
+        warmup_state.status = "disabled"
+
 @app.on_event("shutdown")
 async def shutdown_event():
+    from app.services.ai_detection import get_ai_service
+    from app.services.embedding import close_embedding_pools
+
     loguru.logger.info("Shutting down...")
+    # Encode pool worker processes would otherwise outlive the API
+    close_embedding_pools()
+    # The provider clients' connections belong to this loop; close them before it ends
+    if get_ai_service.cache_info().currsize:
+        await get_ai_service().router.aclose()
 
 @app.get("/health")
 async def health_check():
     return {"status": "ok"}
 
+@app.get("/ready")
+async def readiness_check():
+    """503 until the background warm-up has finished; the body reports cold start and warm-up timings."""
+    state = warmup_state.as_dict()
+    return JSONResponse(status_code=200 if state["ready"] else 503, content=state)
+
 @app.get("/")
 async def root():
     return {"message": "Plagiarism Detection API", "status": "running"}
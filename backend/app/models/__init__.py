@@ -3,6 +3,8 @@ from .ai_detection import AIDetection
 from .batch import Batch
 from .comparison import Comparison
 from .document import Document
+from .embedding import Embedding
+from .fingerprint import Fingerprint
 from .user import User
 
-__all__ = ["Base", "AIDetection", "Batch", "Comparison", "Document", "User"]
+__all__ = ["Base", "AIDetection", "Batch", "Comparison", "Document", "Embedding", "Fingerprint", "User"]
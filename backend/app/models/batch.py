@@ -1,5 +1,6 @@
 import uuid
-from sqlalchemy import Column, String, Integer, DateTime, func, UUID, ForeignKey, Float
+from sqlalchemy import Column, String, Integer, DateTime, func, UUID, ForeignKey, Float, Boolean
+from sqlalchemy.dialects.postgresql import JSONB
 from .base import Base
 
 class Batch(Base):
@@ -14,4 +15,11 @@ class Batch(Base):
     analysis_type = Column(String, default="plagiarism")  # plagiarism, ai, or both
     ai_provider = Column(String, default="local")  # AI detection provider
     ai_threshold = Column(Float, default=0.5)  # AI detection threshold
+    reused_docs = Column(Integer, default=0)  # Documents served from earlier results by content hash
+    prefilter = Column(Boolean, nullable=True)  # MinHash/LSH candidate pruning; None = decide by batch size
+    prefilter_threshold = Column(Float, nullable=True)  # Estimated Jaccard similarity for a candidate pair
+    prefilter_num_perm = Column(Integer, nullable=True)  # MinHash permutations (more = better recall, slower)
+    provider_policy = Column(String, nullable=True)  # fail_fast or reroute when the AI provider is down; None = AI_PROVIDER_POLICY
+    fallback_provider = Column(String, nullable=True)  # Preferred provider when rerouting
+    meta_data = Column(JSONB, nullable=True)  # Processing metadata, e.g. external provider token usage ("ai_usage")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -15,7 +15,7 @@ class Document(Base):
     embedding = Column(Vector(384))  # Assuming sentence-transformers/all-MiniLM-L6-v2 embedding dim
     storage_path = Column(String)
     uploaded_by = Column(UUID(as_uuid=True))
-    status = Column(String, default="queued")  # queued, processing, completed, failed
+    status = Column(String, default="queued")  # ocr_pending, queued, processing, completed, failed
     ai_score = Column(Float, default=0.0)  # AI detection confidence score
     is_ai_generated = Column(Boolean, default=False)  # Is the text AI-generated?
     ai_confidence = Column(Float, default=0.0)  # AI detection confidence level
@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, ForeignKey, String, DateTime, func, UUID
+from sqlalchemy import Column, ForeignKey, String, Integer, DateTime, func, UUID, Index
 from pgvector.sqlalchemy import Vector
 from .base import Base
 
@@ -7,7 +7,24 @@ class Embedding(Base):
     __tablename__ = "embeddings"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    file_id = Column(UUID(as_uuid=True), ForeignKey("documents.id"), nullable=False)
+    file_id = Column(UUID(as_uuid=True), ForeignKey("documents.id"), nullable=False, index=True)
     vector = Column(Vector(384), nullable=False)
     type = Column(String, nullable=False)  # 'text' or 'image'
+    chunk_index = Column(Integer)
+    start_offset = Column(Integer)  # Character span of the chunk in Document.text_content
+    end_offset = Column(Integer)
+    owner_id = Column(UUID(as_uuid=True), index=True)  # Corpus search scope (batch owner)
+    batch_id = Column(UUID(as_uuid=True), ForeignKey("batches.id"), index=True)
+    model_name = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # ANN index for cosine search over the whole corpus (requires pgvector >= 0.5)
+        Index(
+            "ix_embeddings_vector_hnsw",
+            vector,
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"vector": "vector_cosine_ops"},
+        ),
+    )
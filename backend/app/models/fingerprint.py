@@ -0,0 +1,18 @@
+import uuid
+from sqlalchemy import Column, ForeignKey, BigInteger, Integer, UUID, Index
+from .base import Base
+
+class Fingerprint(Base):
+    """Inverted index of winnowed k-gram hashes: fingerprint -> document/offset"""
+    __tablename__ = "fingerprints"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    hash = Column(BigInteger, nullable=False)
+    document_id = Column(UUID(as_uuid=True), ForeignKey("documents.id"), nullable=False, index=True)
+    owner_id = Column(UUID(as_uuid=True))  # Lookup scope (batch owner)
+    start_offset = Column(Integer, nullable=False)  # Character span of the k-gram in Document.text_content
+    end_offset = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("ix_fingerprints_owner_hash", "owner_id", "hash"),
+    )
@@ -1,28 +1,96 @@
 import os
 import json
+import asyncio
+import hashlib
 import logging
-from typing import Dict, Any, Optional
+from collections import Counter, deque
+from functools import lru_cache
+from typing import Callable, Dict, Any, List, Optional, Tuple
 
-from app.core.provider_router import ProviderRouter, ProviderType
+import numpy as np
+
+from app.core.config import settings
+from app.core.cache import get_cache
+
+from app.core.provider_router import ProviderRouter, ProviderType, ProviderUnavailableError
+from app.core.model_registry import model_registry
+from app.services.prescreen import StatisticalPrescreen
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+def spread_order(n: int) -> List[int]:
+    """
+    Indices 0..n-1 ordered so every prefix is spread across the range:
+    both ends first, then midpoints of the remaining gaps, breadth first.
+    """
+    if n <= 0:
+        return []
+    order = [0] if n == 1 else [0, n - 1]
+    queue = deque([(0, n - 1)])
+    while queue:
+        lo, hi = queue.popleft()
+        if hi - lo < 2:
+            continue
+        mid = (lo + hi) // 2
+        order.append(mid)
+        queue.append((lo, mid))
+        queue.append((mid, hi))
+    return order
+
+
+def ai_detection_cache():
+    """Process-wide cache of raw AI scores keyed by (provider, model, text hash), or None if disabled"""
+    if not settings.AI_CACHE_ENABLED:
+        return None
+    return get_cache(
+        "ai_detection",
+        local_entries=settings.AI_CACHE_LOCAL_ENTRIES,
+        shared_entries=settings.AI_CACHE_SHARED_ENTRIES,
+        ttl=settings.AI_CACHE_TTL,
+        encode=lambda entry: json.dumps(entry).encode(),
+        decode=lambda raw: json.loads(raw)
+    )
+
+
 class AIDetectionService:
-    def __init__(self):
+    LOCAL_MODEL = "roberta-base-openai-detector"
+    EXTERNAL_MODELS = {
+        ProviderType.OPENAI: "gpt-3.5-turbo",
+        ProviderType.TOGETHER: "mistralai/Mixtral-8x7B-Instruct-v0.1",
+    }
+    CASCADE_MODEL = "cascade-v1"
+    # Context windows of the external models, in tokens
+    EXTERNAL_CONTEXT_TOKENS = {
+        ProviderType.OPENAI: 16385,
+        ProviderType.TOGETHER: 32768,
+    }
+    PACK_SYSTEM_PROMPT = (
+        "You are an expert AI detection system. You receive a JSON object with a list of text items. "
+        "For every item, estimate the probability that it was generated by an AI. "
+        'Respond with valid JSON only: {"results": [{"id": <item id>, "score": <float 0.0 (Human) to 1.0 (AI)>, '
+        '"reasoning": <one short sentence>}]} with exactly one result per item.'
+    )
+    # Prompt tokens per packed item beyond its text (id, JSON framing), and output tokens per result
+    PACK_ITEM_OVERHEAD = 12
+    PACK_OUTPUT_PER_ITEM = 60
+
+    def __init__(self, load_model: bool = True):
         self.router = ProviderRouter()
         self.classifier = None
-        self._load_local_model()
+        self.cache = ai_detection_cache()
+        self.prescreen = StatisticalPrescreen()
+        if load_model:
+            self._load_local_model()
 
     def _load_local_model(self):
         """Lazy load the local model to save resources if not used."""
         if self.classifier is None and self.router.local_model_available:
             try:
-                from transformers import pipeline
-                # Use a standard, reliable model for AI detection
-                model_name = "roberta-base-openai-detector" 
-                self.classifier = pipeline("text-classification", model=model_name)
-                logger.info(f"Local AI detection model '{model_name}' loaded successfully.")
+                # Use a standard, reliable model for AI detection, shared process-wide
+                model_name = self.LOCAL_MODEL
+                self.classifier = model_registry.text_classifier(model_name)
+                logger.info(f"Local AI detection model '{model_name}' ready.")
             except Exception as e:
                 logger.error(f"Failed to load local AI model: {e}")
                 self.classifier = None
@@ -33,7 +101,7 @@ class AIDetectionService:
         
         Args:
             text: The text to analyze.
-            provider: 'local', 'openai', or 'together'.
+            provider: 'local', 'openai', 'together' or 'cascade'.
             threshold: Confidence threshold for 'AI' label (default 0.5).
             
         Returns:
@@ -45,11 +113,12 @@ class AIDetectionService:
             self.router.log_usage(validated_provider, "ai_detection", {"text_length": len(text)})
 
             if validated_provider == ProviderType.LOCAL:
-                return self._detect_local(text, threshold)
-            elif validated_provider == ProviderType.OPENAI:
-                return self._detect_external(text, ProviderType.OPENAI, threshold)
-            elif validated_provider == ProviderType.TOGETHER:
-                return self._detect_external(text, ProviderType.TOGETHER, threshold)
+                cached = self._cached_result(text, validated_provider, threshold)
+                if cached is not None:
+                    return cached
+                return self._store_result(text, validated_provider, self._detect_local(text, threshold))
+            # External calls and the cascade are async; synchronous callers get a short-lived loop
+            return asyncio.run(self._run_once(self._detect_validated(text, validated_provider, threshold)))
             
         except ValueError as e:
             logger.error(f"Provider validation failed: {e}")
@@ -57,55 +126,272 @@ class AIDetectionService:
         except Exception as e:
             logger.exception(f"AI detection failed: {e}")
             return self._error_response(f"Internal error: {str(e)}")
+
+    async def detect_async(
+        self,
+        text: str,
+        provider: str = ProviderType.LOCAL,
+        threshold: float = 0.5,
+        score_windows: Optional[Callable[[List[List[int]]], List[float]]] = None,
+        policy: Optional[str] = None,
+        fallback_provider: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Async variant of detect. External providers run on the router's pooled clients,
+        so many calls can be awaited concurrently; the local model runs in a worker thread.
+        score_windows replaces the local forward pass, e.g. with a shared micro-batching queue.
+        policy ('fail_fast' or 'reroute', default AI_PROVIDER_POLICY) decides what happens when an
+        external provider fails or its circuit breaker is open: return the error, or retry on
+        fallback_provider / the healthiest other provider.
+        """
+        try:
+            validated_provider = self.router.validate_provider(provider)
+            self.router.log_usage(validated_provider, "ai_detection", {"text_length": len(text)})
+
+            return await self._detect_validated(text, validated_provider, threshold, score_windows, policy, fallback_provider)
+
+        except ValueError as e:
+            logger.error(f"Provider validation failed: {e}")
+            return self._error_response(str(e))
+        except Exception as e:
+            logger.exception(f"AI detection failed: {e}")
+            return self._error_response(f"Internal error: {str(e)}")
     
+    async def _detect_validated(
+        self,
+        text: str,
+        provider: str,
+        threshold: float,
+        score_windows: Optional[Callable] = None,
+        policy: Optional[str] = None,
+        fallback_provider: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Cached detection with an already validated provider."""
+        if provider == ProviderType.CASCADE:
+            return await self._detect_cascade(text, threshold, score_windows)
+
+        cached = await self._cached_result_async(text, provider, threshold)
+        if cached is not None:
+            return cached
+        if provider == ProviderType.LOCAL:
+            result = await asyncio.to_thread(self._detect_local, text, threshold, score_windows)
+            return await self._store_result_async(text, provider, result)
+
+        packed = settings.AI_PACKING_ENABLED
+        if packed:
+            results, usage = await self.detect_external_packed({"text": text}, provider, threshold)
+            result = results["text"]
+            if result.get("label") != "Error":
+                result["details"]["usage"] = usage
+        else:
+            result = await self._detect_external(text, provider, threshold)
+        if result.get("label") == "Error" and (policy or settings.AI_PROVIDER_POLICY) == "reroute":
+            fallback = self.router.choose_fallback(provider, fallback_provider)
+            if fallback is not None:
+                logger.warning(f"Rerouting AI detection from {ProviderType(provider).value} to {fallback.value}: {result['details'].get('error')}")
+                rerouted = await self._detect_validated(text, fallback, threshold, score_windows, policy="fail_fast")
+                rerouted["details"] = dict(
+                    rerouted.get("details", {}),
+                    rerouted_from=ProviderType(provider).value,
+                    reroute_reason=result["details"].get("error")
+                )
+                return rerouted
+        if packed:
+            return result  # detect_external_packed has already cached it
+        return await self._store_result_async(text, provider, result)
+
+    async def _detect_cascade(self, text: str, threshold: float, score_windows: Optional[Callable] = None) -> Dict[str, Any]:
+        """
+        Tiered detection: the statistical pre-screen settles clear-cut documents (only with
+        AI_CASCADE_PRESCREEN_VERDICTS on), the local model scores the rest, and local results
+        near the threshold escalate to AI_CASCADE_EXTERNAL_PROVIDER when one is configured.
+        The final score comes from the last stage that succeeded; details.cascade records the
+        stage reached and every stage's score.
+        """
+        screen = await asyncio.to_thread(self.prescreen.evaluate, text, threshold)
+        stages = {"prescreen": {"score": screen["score"], "verdict": screen["verdict"], "features": screen["features"]}}
+        final_stage, final = "prescreen", {"score": screen["score"], "details": {}}
+
+        if screen["verdict"] is None:
+            if self.router.local_model_available:
+                local = await self._detect_validated(text, ProviderType.LOCAL, threshold, score_windows)
+                if local.get("label") != "Error":
+                    stages["local"] = {"score": local["score"], "stop_reason": local["details"].get("stop_reason")}
+                    final_stage, final = "local", local
+
+            external = settings.AI_CASCADE_EXTERNAL_PROVIDER.lower()
+            uncertain = final_stage == "prescreen" or abs(final["score"] - threshold) < settings.AI_CASCADE_LOCAL_MARGIN
+            if external and uncertain and self.router.get_api_key(external):
+                result = await self._detect_validated(text, ProviderType(external), threshold, policy="fail_fast")
+                if result.get("label") != "Error":
+                    stages[external] = {"score": result["score"]}
+                    final_stage, final = "external", result
+
+        if final_stage == "prescreen" and screen["verdict"] is None:
+            # The pre-screen score is only a hint; it never becomes the verdict unconfirmed
+            return self._error_response("Pre-screen not conclusive and no model stage could score the document")
+
+        score = final["score"]
+        is_ai = score > threshold
+        return {
+            "is_ai": is_ai,
+            "score": round(score, 4),
+            "confidence": round(abs(score - 0.5) * 2, 4),
+            "label": "Likely AI" if is_ai else "Likely Human",
+            "provider": ProviderType.CASCADE.value,
+            "details": {
+                "model": self.CASCADE_MODEL,
+                "cascade": {"stage": final_stage, "stages": stages},
+                "stage_details": final["details"]
+            }
+        }
+
+    async def _run_once(self, coro):
+        """Await coro on a short-lived event loop, closing the pooled clients before the loop ends."""
+        try:
+            return await coro
+        finally:
+            await self.router.aclose()
+
+    def model_version(self, provider: str) -> str:
+        """Model that produces scores for a provider, as recorded in AIDetection.model_version."""
+        if provider == ProviderType.LOCAL:
+            return self.LOCAL_MODEL
+        if provider == ProviderType.CASCADE:
+            return self.CASCADE_MODEL
+        return self.EXTERNAL_MODELS.get(provider, "unknown")
+
+    def _cache_key(self, text: str, provider: str) -> str:
+        # Whitespace-only edits (re-extraction, copy/paste) don't change the key
+        normalized = " ".join(text.split())
+        text_hash = hashlib.sha256(normalized.encode()).hexdigest()
+        return f"{ProviderType(provider).value}:{self.model_version(provider)}:{text_hash}"
+
+    def _cached_result(self, text: str, provider: str, threshold: float) -> Optional[Dict[str, Any]]:
+        """Rebuild a result from the cached raw score, applying this call's threshold."""
+        if self.cache is None:
+            return None
+        return self._from_cache_entry(self.cache.get(self._cache_key(text, provider)), provider, threshold)
+
+    async def _cached_result_async(self, text: str, provider: str, threshold: float) -> Optional[Dict[str, Any]]:
+        """_cached_result for the event loop: the Redis lookup runs in a worker thread."""
+        if self.cache is None:
+            return None
+        return self._from_cache_entry(await self.cache.aget(self._cache_key(text, provider)), provider, threshold)
+
+    def _from_cache_entry(self, entry: Optional[Dict[str, Any]], provider: str, threshold: float) -> Optional[Dict[str, Any]]:
+        if entry is None:
+            return None
+        return self.result_for_threshold(
+            entry["score"], entry["confidence"], dict(entry["details"], cache_hit=True), provider, threshold
+        )
+
+    def result_for_threshold(
+        self,
+        score: float,
+        confidence: float,
+        details: Dict[str, Any],
+        provider: str,
+        threshold: float
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Rebuild a result from a stored threshold-independent score (cache entry or AIDetection row)
+        with a new threshold. None when the stored run is not conclusive for that threshold, so the
+        text must be scored again.
+        """
+        if not self._conclusive_for(details, threshold):
+            return None
+        is_ai = score > threshold
+        return {
+            "is_ai": is_ai,
+            "score": score,
+            "confidence": confidence,
+            "label": "Likely AI" if is_ai else "Likely Human",
+            "provider": ProviderType(provider).value,
+            "details": details
+        }
+
+    def _conclusive_for(self, details: Dict[str, Any], threshold: float) -> bool:
+        # An adaptive early stop is only conclusive for thresholds outside its score interval
+        interval = details.get("score_interval")
+        if details.get("stop_reason") in ("confident_ai", "confident_human") and interval and interval[0] <= threshold <= interval[1]:
+            return False
+
+        cascade = details.get("cascade")
+        if not cascade:
+            return True
+        # The cascade's stage decisions depended on the threshold; they must come out the same
+        stages = cascade.get("stages", {})
+        screen = stages.get("prescreen")
+        if screen is not None and self.prescreen.verdict(screen.get("features", {}), screen["score"], threshold) != screen.get("verdict"):
+            return False
+        if cascade.get("stage") != "prescreen":
+            local = stages.get("local")
+            uncertain = local is None or abs(local["score"] - threshold) < settings.AI_CASCADE_LOCAL_MARGIN
+            external = settings.AI_CASCADE_EXTERNAL_PROVIDER.lower()
+            would_escalate = uncertain and bool(external) and bool(self.router.get_api_key(external))
+            if would_escalate != (cascade.get("stage") == "external"):
+                return False
+        return self._conclusive_for(details.get("stage_details", {}), threshold)
+
+    def _store_result(self, text: str, provider: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Cache the threshold-independent part of a successful result."""
+        entry = self._cache_entry(result)
+        if entry is not None and self.cache is not None:
+            self.cache.set(self._cache_key(text, provider), entry)
+        return result
+
+    async def _store_result_async(self, text: str, provider: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        """_store_result for the event loop: the Redis write runs in a worker thread."""
+        entry = self._cache_entry(result)
+        if entry is not None and self.cache is not None:
+            await self.cache.aset(self._cache_key(text, provider), entry)
+        return result
+
+    @staticmethod
+    def _cache_entry(result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Marks a successful result as freshly scored; None for errors, which are never cached."""
+        if result.get("label") == "Error":
+            return None
+        result["details"] = dict(result.get("details", {}), cache_hit=False)
+        return {
+            "score": result["score"],
+            "confidence": result["confidence"],
+            "details": {k: v for k, v in result["details"].items() if k not in ("cache_hit", "usage")}
+        }
+
     def health_check(self) -> Dict[str, Any]:
         """Check if the AI detection service is operational."""
         return {
-            "status": "healthy" if self.classifier is not None else "unavailable",
+            "status": "healthy" if self.classifier is not None else ("not_loaded" if self.router.local_model_available else "unavailable"),
             "local_model_loaded": self.classifier is not None,
             "external_providers": {
                 "openai": self.router.openai_api_key is not None,
                 "together": self.router.together_api_key is not None
-            }
+            },
+            "providers": self.router.stats(),
+            "models": model_registry.stats()
         }
 
-    def _detect_local(self, text: str, threshold: float) -> Dict[str, Any]:
+    def _detect_local(self, text: str, threshold: float, score_windows: Optional[Callable] = None) -> Dict[str, Any]:
         """Run detection using local HuggingFace model."""
         if not self.classifier:
             self._load_local_model()
             if not self.classifier:
                 return self._error_response("Local model unavailable")
 
-        # Chunking for long text (simple overlap)
-        chunk_size = 512 # Token approximation
-        chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
-        
-        # Limit chunks to prevent OOM/timeout on massive files
-        chunks = chunks[:20] 
-        
-        results = []
         try:
-            for chunk in chunks:
-                # Truncate to 512 chars roughly to be safe for model
-                res = self.classifier(chunk[:512])[0]
-                results.append(res)
+            windows, token_count = self._token_windows(text)
+            if not windows:
+                return self._error_response("No text to analyze")
+            if settings.AI_DETECTION_ADAPTIVE:
+                ai_probs, stop_reason, interval = self._score_adaptive(windows, threshold, score_windows)
+            else:
+                ai_probs, stop_reason, interval = self._score_fixed(windows, score_windows)
         except Exception as e:
             return self._error_response(f"Model inference failed: {e}")
 
-        if not results:
-            return self._error_response("No text to analyze")
-
         # Aggregate scores
-        # Model returns label='Fake' (AI) or 'Real' (Human)
-        # We want probability of AI
-        ai_probs = []
-        for res in results:
-            score = res['score']
-            if res['label'] == 'Fake':
-                ai_probs.append(score)
-            else:
-                ai_probs.append(1 - score)
-        
         avg_ai_score = sum(ai_probs) / len(ai_probs)
         is_ai = avg_ai_score > threshold
         
@@ -120,24 +406,261 @@ class AIDetectionService:
             "label": "Likely AI" if is_ai else "Likely Human",
             "provider": ProviderType.LOCAL,
             "details": {
-                "chunks_analyzed": len(results),
-                "model": "roberta-base-openai-detector"
+                "chunks_analyzed": len(ai_probs),
+                "chunks_total": len(windows),
+                "tokens": token_count,
+                "stop_reason": stop_reason,
+                "score_interval": [round(interval[0], 4), round(interval[1], 4)],
+                "model": self.LOCAL_MODEL
             }
         }
 
-    def _detect_external(self, text: str, provider: str, threshold: float) -> Dict[str, Any]:
-        """Run detection using OpenAI or Together API."""
-        from openai import OpenAI
-        
-        api_key = self.router.get_api_key(provider)
-        base_url = None
-        model = "gpt-3.5-turbo" # Default
-        
-        if provider == ProviderType.TOGETHER:
-            base_url = "https://api.together.xyz/v1"
-            model = "mistralai/Mixtral-8x7B-Instruct-v0.1"
-        
-        client = OpenAI(api_key=api_key, base_url=base_url)
+    def _token_windows(self, text: str) -> Tuple[List[List[int]], int]:
+        """
+        Split text into windows that fill the model's context, overlapping by
+        AI_DETECTION_STRIDE tokens.
+        Returns (windows of token ids without special tokens, token count).
+        """
+        tokenizer = self.classifier.tokenizer
+        ids = tokenizer(text, add_special_tokens=False, return_attention_mask=False, verbose=False)["input_ids"]
+        if not ids:
+            return [], 0
+
+        max_length = tokenizer.model_max_length
+        if max_length > 100_000:  # sentinel for tokenizers saved without a limit
+            max_length = 512
+        window = max_length - tokenizer.num_special_tokens_to_add()
+        step = max(window - settings.AI_DETECTION_STRIDE, 1)
+
+        starts = list(range(0, max(len(ids) - window, 0) + 1, step))
+        if starts[-1] + window < len(ids):
+            starts.append(len(ids) - window)  # cover the tail
+        return [ids[s:s + window] for s in starts], len(ids)
+
+    def _score_fixed(self, windows: List[List[int]], score_windows: Optional[Callable] = None) -> Tuple[List[float], str, Tuple[float, float]]:
+        """
+        Score every window, or AI_DETECTION_MAX_WINDOWS evenly spaced ones on longer documents.
+        Returns (scores, stop reason, score interval).
+        """
+        score_windows = score_windows or self._score_windows
+        if len(windows) > settings.AI_DETECTION_MAX_WINDOWS:
+            picks = np.linspace(0, len(windows) - 1, settings.AI_DETECTION_MAX_WINDOWS).round().astype(int)
+            probs = score_windows([windows[i] for i in sorted(set(picks))])
+            return probs, "max_windows", self._score_interval(probs, len(windows))
+        probs = score_windows(windows)
+        return probs, "all_windows", self._score_interval(probs, len(windows))
+
+    def _score_adaptive(self, windows: List[List[int]], threshold: float, score_windows: Optional[Callable] = None) -> Tuple[List[float], str, Tuple[float, float]]:
+        """
+        Sequential sampling: score windows spread across the document one batch at a
+        time, and stop as soon as the confidence interval of the mean score lies
+        entirely above or below the threshold. Borderline documents keep sampling
+        up to AI_DETECTION_MAX_WINDOWS.
+        Returns (scores, stop reason, score interval).
+        """
+        score_windows = score_windows or self._score_windows
+        order = spread_order(len(windows))[:settings.AI_DETECTION_MAX_WINDOWS]
+        probs: List[float] = []
+        interval = (0.0, 1.0)
+        while len(probs) < len(order):
+            # A small first round so clear-cut documents stop early, then full batches
+            step = max(settings.AI_ADAPTIVE_MIN_WINDOWS if not probs else settings.AI_DETECTION_BATCH_SIZE, 1)
+            probs.extend(score_windows([windows[j] for j in order[len(probs):len(probs) + step]]))
+            interval = self._score_interval(probs, len(windows))
+            if len(probs) == len(windows):
+                break
+            if interval[0] > threshold:
+                return probs, "confident_ai", interval
+            if interval[1] <= threshold:
+                return probs, "confident_human", interval
+
+        stop_reason = "all_windows" if len(probs) == len(windows) else "max_windows"
+        return probs, stop_reason, interval
+
+    @staticmethod
+    def _score_interval(probs: List[float], population: int) -> Tuple[float, float]:
+        """
+        Normal-approximation confidence interval (AI_ADAPTIVE_Z) of the mean window score,
+        with a finite population correction: it collapses to the mean once every window is scored.
+        The sample deviation has a floor so a few identical scores can't end sampling on their own.
+        """
+        n = len(probs)
+        mean = float(np.mean(probs))
+        if n >= population:
+            return mean, mean
+        std = max(float(np.std(probs, ddof=1)) if n > 1 else 0.0, 0.05)
+        correction = np.sqrt((population - n) / (population - 1))
+        half_width = settings.AI_ADAPTIVE_Z * std / np.sqrt(n) * correction
+        return max(float(mean - half_width), 0.0), min(float(mean + half_width), 1.0)
+
+    def _score_windows(self, windows: List[List[int]], batch_size: Optional[int] = None) -> List[float]:
+        """AI probability per token window, in batches of AI_DETECTION_BATCH_SIZE without autograd."""
+        import torch
+
+        tokenizer = self.classifier.tokenizer
+        model = self.classifier.model
+        # Model returns label='Fake' (AI) or 'Real' (Human); we want probability of AI
+        ai_index = model.config.label2id.get("Fake", 0)
+
+        probs = []
+        batch_size = max(batch_size or settings.AI_DETECTION_BATCH_SIZE, 1)
+        with torch.inference_mode():
+            for i in range(0, len(windows), batch_size):
+                batch = tokenizer.pad(
+                    {"input_ids": [tokenizer.build_inputs_with_special_tokens(w) for w in windows[i:i + batch_size]]},
+                    return_tensors="pt"
+                ).to(model.device)
+                logits = model(**batch).logits
+                probs.extend(torch.softmax(logits.float(), dim=-1)[:, ai_index].tolist())
+        return probs
+
+    async def detect_external_packed(
+        self,
+        texts: Dict[str, str],
+        provider: str,
+        threshold: float
+    ) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, int]]:
+        """
+        Score several documents on an external provider with packed JSON-mode requests.
+        Documents are split into chunks of AI_PACK_CHUNK_TOKENS (at most AI_PACK_MAX_CHUNKS per
+        document, spread across it). Chunks of all documents are packed into as few requests
+        as the model's context budget and AI_PACK_MAX_ITEMS allow, and sent concurrently.
+        Each document's score is the length-weighted mean of its chunk scores.
+        Returns ({key: result}, token usage summed over the requests).
+        """
+        provider = ProviderType(provider)
+        model = self.model_version(provider)
+        results: Dict[str, Dict[str, Any]] = {}
+        usage: Counter = Counter()
+
+        items = []  # (item id, document key, weight, chunk text)
+        for key, text in texts.items():
+            cached = await self._cached_result_async(text, provider, threshold)
+            if cached is not None:
+                results[key] = cached
+                continue
+            for chunk in self._pack_chunks(text, provider):
+                items.append((str(len(items)), key, len(chunk), chunk))
+
+        scores: Dict[str, Tuple[float, str]] = {}
+        errors = []
+        # One follow-up round for items the model left out of its answer
+        for _ in range(2):
+            remaining = [item for item in items if item[0] not in scores]
+            if not remaining:
+                break
+            groups = self._pack_items(remaining, provider)
+            for outcome in await asyncio.gather(*[self._score_packed(provider, model, group, usage) for group in groups]):
+                if isinstance(outcome, str):
+                    errors.append(outcome)
+                else:
+                    scores.update(outcome)
+
+        by_document: Dict[str, list] = {}
+        for item_id, key, weight, _ in items:
+            by_document.setdefault(key, []).append((item_id, weight))
+        for key, doc_items in by_document.items():
+            scored = [(scores[item_id], weight) for item_id, weight in doc_items if item_id in scores]
+            if not scored:
+                results[key] = self._error_response(f"External provider error: {errors[-1] if errors else 'no score returned'}")
+                continue
+            ai_score = sum(score * weight for (score, _), weight in scored) / sum(weight for _, weight in scored)
+            is_ai = ai_score > threshold
+            result = {
+                "is_ai": is_ai,
+                "score": round(ai_score, 4),
+                "confidence": round(abs(ai_score - 0.5) * 2, 4),
+                "label": "Likely AI" if is_ai else "Likely Human",
+                "provider": provider.value,
+                "details": {
+                    "reasoning": scored[0][0][1],
+                    "model": model,
+                    "chunks_analyzed": len(scored),
+                    "chunks_total": len(doc_items),
+                    "packed": True
+                }
+            }
+            results[key] = await self._store_result_async(texts[key], provider, result)
+
+        for key in texts:
+            results.setdefault(key, self._error_response("No text to analyze"))
+        return results, dict(usage)
+
+    def _pack_budget(self, provider: str) -> int:
+        """Prompt tokens available to one packed request"""
+        context = self.EXTERNAL_CONTEXT_TOKENS.get(provider, 8192)
+        reserve = self.PACK_OUTPUT_PER_ITEM * settings.AI_PACK_MAX_ITEMS + 100
+        return min(settings.AI_PACK_MAX_PROMPT_TOKENS, context - reserve)
+
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        # ~4 characters per token for English; the provider reports the real count in usage
+        return len(text) // 4 + 1
+
+    def _pack_chunks(self, text: str, provider: str) -> List[str]:
+        """Chunks of a document that fit a packed request, spread across it when there are too many."""
+        room = self._pack_budget(provider) - self._estimate_tokens(self.PACK_SYSTEM_PROMPT) - self.PACK_ITEM_OVERHEAD
+        chunk_chars = max(min(settings.AI_PACK_CHUNK_TOKENS, room), 1) * 4
+        chunks = [text[i:i + chunk_chars] for i in range(0, len(text), chunk_chars)]
+        chunks = [chunk for chunk in chunks if chunk.strip()]
+        if len(chunks) > settings.AI_PACK_MAX_CHUNKS:
+            chunks = [chunks[i] for i in sorted(spread_order(len(chunks))[:settings.AI_PACK_MAX_CHUNKS])]
+        return chunks
+
+    def _pack_items(self, items: list, provider: str) -> List[list]:
+        """Greedily group items into requests that fit the prompt budget and AI_PACK_MAX_ITEMS."""
+        budget = self._pack_budget(provider) - self._estimate_tokens(self.PACK_SYSTEM_PROMPT)
+        groups, current, used = [], [], 0
+        for item in items:
+            cost = self._estimate_tokens(item[3]) + self.PACK_ITEM_OVERHEAD
+            if current and (used + cost > budget or len(current) >= settings.AI_PACK_MAX_ITEMS):
+                groups.append(current)
+                current, used = [], 0
+            current.append(item)
+            used += cost
+        if current:
+            groups.append(current)
+        return groups
+
+    async def _score_packed(self, provider: str, model: str, group: list, usage: Counter):
+        """One packed request. Returns {item id: (score, reasoning)}, or an error message."""
+        payload = {"items": [{"id": item_id, "text": text} for item_id, _, _, text in group]}
+        try:
+            response = await self.router.chat_completion(
+                provider,
+                model=model,
+                messages=[
+                    {"role": "system", "content": self.PACK_SYSTEM_PROMPT},
+                    {"role": "user", "content": json.dumps(payload)}
+                ],
+                temperature=0.0,
+                max_tokens=self.PACK_OUTPUT_PER_ITEM * len(group) + 50,
+                response_format={"type": "json_object"}
+            )
+            if response.usage is not None:
+                usage["requests"] += 1
+                usage["prompt_tokens"] += response.usage.prompt_tokens or 0
+                usage["completion_tokens"] += response.usage.completion_tokens or 0
+                usage["total_tokens"] += response.usage.total_tokens or 0
+            usage["items"] += len(group)
+
+            expected = {item_id for item_id, _, _, _ in group}
+            scores = {}
+            for entry in json.loads(response.choices[0].message.content).get("results", []):
+                item_id = str(entry.get("id"))
+                if item_id in expected and entry.get("score") is not None:
+                    score = min(max(float(entry["score"]), 0.0), 1.0)
+                    scores[item_id] = (score, entry.get("reasoning", "No reasoning provided"))
+            return scores
+        except ProviderUnavailableError as e:
+            return str(e)
+        except Exception as e:
+            logger.error(f"Packed request to {provider.value} failed ({len(group)} items): {e}")
+            return str(e)
+
+    async def _detect_external(self, text: str, provider: str, threshold: float) -> Dict[str, Any]:
+        """Run detection using OpenAI or Together API through the router's pooled client."""
+        model = self.model_version(provider)
         
         prompt = f"""Analyze the following text for AI-generated content.
         Respond with a JSON object containing:
@@ -148,7 +671,8 @@ class AIDetectionService:
         {text[:4000]}""" # Truncate to fit context window
 
         try:
-            response = client.chat.completions.create(
+            response = await self.router.chat_completion(
+                provider,
                 model=model,
                 messages=[
                     {"role": "system", "content": "You are an expert AI detection system. Output valid JSON only."},
@@ -160,6 +684,14 @@ class AIDetectionService:
             
             content = response.choices[0].message.content
             result = json.loads(content)
+            usage = {}
+            if response.usage is not None:
+                usage = {
+                    "requests": 1,
+                    "prompt_tokens": response.usage.prompt_tokens or 0,
+                    "completion_tokens": response.usage.completion_tokens or 0,
+                    "total_tokens": response.usage.total_tokens or 0
+                }
             
             ai_score = float(result.get("score", 0.5))
             is_ai = ai_score > threshold
@@ -173,10 +705,14 @@ class AIDetectionService:
                 "provider": provider,
                 "details": {
                     "reasoning": result.get("reasoning", "No reasoning provided"),
-                    "model": model
+                    "model": model,
+                    "usage": usage
                 }
             }
             
+        except ProviderUnavailableError as e:
+            # Breaker open: no request was sent, fail fast
+            return self._error_response(str(e))
         except Exception as e:
             logger.error(f"External API error ({provider}): {e}")
             return self._error_response(f"External provider error: {str(e)}")
@@ -190,3 +726,9 @@ class AIDetectionService:
             "provider": "unknown",
             "details": {"error": message}
         }
+
+
+@lru_cache(maxsize=None)
+def get_ai_service() -> AIDetectionService:
+    """Process-wide AIDetectionService. The local model loads on first use or during warm-up."""
+    return AIDetectionService(load_model=False)
@@ -1,111 +1,567 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
+import uuid
+from io import BytesIO
+from typing import Any, Dict, List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, func
+from celery import chord
 from app.core.config import settings
 from app.core.celery import app as celery
+from app.core.worker_runtime import worker_runtime
+from app.core.progress import progress
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from app.models.batch import Batch
 from app.models.document import Document
 from app.models.comparison import Comparison
-from app.services.embedding import EmbeddingService
-from app.services.ai_detection import AIDetectionService
+from app.models.ai_detection import AIDetection
+from app.models.embedding import Embedding
+from app.services.embedding import ChunkEmbeddingStore, EmbeddingService, get_embedding_service
+from app.services.ai_detection import get_ai_service
+from app.services.bulk_writer import BulkResultWriter
+from app.core.provider_router import ProviderType
+from app.services.corpus_search import CorpusSearchService
+from app.services.minhash import MinHashPrefilter
+from app.services.reuse import ResultReuseService
+from app.services.winnowing import WinnowingService, merge_verbatim_results
 # from app.services.comparison import ComparisonService # Deleted
 import asyncio
+from collections import Counter
+
+PLAGIARISM_TYPES = ["plagiarism", "both", "mixed"]
+AI_TYPES = ["ai", "both", "mixed"]
+
+# A batch runs as a Celery workflow, so its throughput scales with the number of workers.
+# Stage tasks are routed to their own queues (see app/core/celery.py):
+#   process_batch       marks the batch processing; documents deferred at upload go to OCR first
+#   extract_documents   [ocr] per document: OCR of scanned PDFs and images
+#   plan_analysis       splits the documents into shards for the two analysis stages
+#   embed_documents     [embedding] per shard: chunk embeddings, corpus and fingerprint indexing
+#   detect_ai           [ai] per shard: AI detection
+#   plan_comparisons    chord callback once every shard is analyzed: prefilter, deal out comparison shards
+#   compare_documents   [compare] per shard: pairwise and corpus comparisons on vectors read back from the index
+#   finalize_batch      chord callback: batch status and counters
+# mark_batch_failed is the error callback of every chord.
+
+
+def _ordered_documents(batch_id: str):
+    """Batch documents in the order every stage agrees on (pairs are scheduled by position)"""
+    return select(Document).where(Document.batch_id == batch_id).order_by(Document.created_at, Document.id)
+
+
+def _shards(doc_ids: List[str]) -> List[List[str]]:
+    size = max(settings.BATCH_SHARD_SIZE, 1)
+    return [doc_ids[i:i + size] for i in range(0, len(doc_ids), size)]
 
-embedding_service = EmbeddingService()
-ai_service = AIDetectionService()
 
 @celery.task
 def process_batch(batch_id: str, provider: str = "local", ai_threshold: float = 0.5):
     """Process a batch of documents for plagiarism and/or AI detection"""
-    asyncio.run(_process_batch_async(batch_id, provider, ai_threshold))
-
-async def _process_batch_async(batch_id: str, provider: str, ai_threshold: float):
-    engine = create_async_engine(settings.DATABASE_URL, echo=False)
-    SessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
-    try:
-        async with SessionLocal() as session:
-            # Get batch and documents
-            batch = await session.get(Batch, batch_id)
-            if not batch:
-                print(f"Batch {batch_id} not found")
-                return
-            
-            batch.status = "processing"
+    ocr_ids = worker_runtime.run(_start_batch_async(batch_id))
+    if ocr_ids is None:
+        return
+    if not ocr_ids:
+        _plan_analysis(batch_id, provider, ai_threshold)
+        return
+
+    # OCR is slow and uneven, so every deferred document is its own task
+    workflow = chord(
+        [extract_documents.si(batch_id, [doc_id]) for doc_id in ocr_ids],
+        plan_analysis.si(batch_id, provider, ai_threshold)
+    )
+    workflow.on_error(mark_batch_failed.si(batch_id))
+    workflow.delay()
+    print(f"Batch {batch_id}: {len(ocr_ids)} documents queued for OCR")
+
+
+async def _start_batch_async(batch_id: str) -> Optional[List[str]]:
+    """Mark the batch processing. Returns the documents still waiting for OCR."""
+    async with worker_runtime.session() as session:
+        # Get batch and documents
+        batch = await session.get(Batch, batch_id)
+        if not batch:
+            print(f"Batch {batch_id} not found")
+            return None
+
+        batch.status = "processing"
+        batch.processed_docs = 0  # counted up by the stage tasks as documents complete
+        await session.commit()
+        progress.publish(batch_id, "batch", status="processing", processed_docs=0, total_docs=batch.total_docs)
+
+        result = await session.execute(
+            _ordered_documents(batch_id).with_only_columns(Document.id).where(Document.status == "ocr_pending")
+        )
+        return [str(doc_id) for doc_id in result.scalars().all()]
+
+
+@celery.task
+def extract_documents(batch_id: str, doc_ids: List[str]):
+    """OCR stage: text of the scanned PDFs and images that were deferred at upload"""
+    worker_runtime.run(_extract_documents_async(batch_id, doc_ids))
+
+
+async def _extract_documents_async(batch_id: str, doc_ids: List[str]):
+    from app.services.parsing import extract_text_from_file
+    from app.services.storage import StorageService
+    storage_service = StorageService()
+    async with worker_runtime.session() as session:
+        result = await session.execute(_ordered_documents(batch_id).where(Document.id.in_(doc_ids)))
+        for doc in result.scalars().all():
+            if doc.status != "ocr_pending":
+                continue
+            try:
+                file_obj = BytesIO(storage_service.load(doc.storage_path))
+                file_obj.name = doc.filename
+                # OCR blocks the event loop, which is fine: this task has nothing else to do
+                text_content = await extract_text_from_file(file_obj)
+                doc.text_content = text_content
+                doc.content_hash = EmbeddingService.hash_content(text_content) if text_content else None
+                doc.status = "queued"
+            except Exception as e:
+                print(f"Error extracting text from document {doc.id}: {e}")
+                doc.status = "failed"
             await session.commit()
-            
-            # Get all documents in this batch
-            from sqlalchemy import select
-            result = await session.execute(
-                select(Document).where(Document.batch_id == batch_id)
-            )
-            documents = result.scalars().all()
-            
-            analysis_type = batch.analysis_type or "plagiarism"  # default to plagiarism
-            
-            # Instantiate PlagiarismService
-            from app.services.plagiarism import PlagiarismService
-            plagiarism_service = PlagiarismService(session)
-
-            # Process each document
-            for doc in documents:
+            progress.publish(batch_id, "document", document_id=str(doc.id), stage="ocr", status=doc.status)
+
+
+@celery.task
+def plan_analysis(batch_id: str, provider: str, ai_threshold: float):
+    """Fan the batch out to the embedding and AI detection stages (chord callback after OCR)"""
+    _plan_analysis(batch_id, provider, ai_threshold)
+
+
+def _plan_analysis(batch_id: str, provider: str, ai_threshold: float):
+    planned = worker_runtime.run(_plan_analysis_async(batch_id))
+    if planned is None:
+        return
+    analysis_type, doc_ids = planned
+
+    header = []
+    if analysis_type in PLAGIARISM_TYPES:
+        header += [embed_documents.si(batch_id, shard) for shard in _shards(doc_ids)]
+    if analysis_type in AI_TYPES:
+        header += [detect_ai.si(batch_id, shard, provider, ai_threshold) for shard in _shards(doc_ids)]
+    if not header:
+        worker_runtime.run(_finalize_batch_async(batch_id))
+        return
+
+    # Embedding and AI detection shards of the same documents run side by side
+    workflow = chord(header, plan_comparisons.s(batch_id, provider))
+    workflow.on_error(mark_batch_failed.si(batch_id))
+    workflow.delay()
+    print(f"Batch {batch_id}: {len(doc_ids)} documents in {len(header)} analysis tasks")
+
+
+async def _plan_analysis_async(batch_id: str):
+    async with worker_runtime.session() as session:
+        batch = await session.get(Batch, batch_id)
+        if not batch:
+            print(f"Batch {batch_id} not found")
+            return None
+
+        await session.execute(
+            update(Document)
+            .where(Document.batch_id == batch_id, Document.status == "queued")
+            .values(status="processing")
+        )
+        await session.commit()
+
+        result = await session.execute(
+            _ordered_documents(batch_id).with_only_columns(Document.id).where(Document.status == "processing")
+        )
+        return batch.analysis_type or "plagiarism", [str(doc_id) for doc_id in result.scalars().all()]
+
+
+async def _load_shard(session: AsyncSession, batch_id: str, doc_ids: List[str]) -> List[Document]:
+    """Documents of a shard that are still being processed (OCR failures are skipped)"""
+    result = await session.execute(
+        _ordered_documents(batch_id).where(Document.id.in_(doc_ids), Document.status == "processing")
+    )
+    return result.scalars().all()
+
+
+@celery.task
+def embed_documents(batch_id: str, doc_ids: List[str]) -> Dict[str, Any]:
+    """Embedding stage for one shard: chunk vectors and fingerprints into the indexes the comparison stage reads"""
+    return worker_runtime.run(_embed_documents_async(batch_id, doc_ids))
+
+
+async def _embed_documents_async(batch_id: str, doc_ids: List[str]) -> Dict[str, Any]:
+    embedding_service = get_embedding_service()
+    reused_ids = set()
+    async with worker_runtime.session() as session:
+        batch = await session.get(Batch, batch_id)
+        if not batch:
+            print(f"Batch {batch_id} not found")
+            return {}
+
+        documents = await _load_shard(session, batch_id, doc_ids)
+        corpus_search = CorpusSearchService(session, embedding_service)
+
+        # Chunk embeddings are computed once per document; the comparison stage reads them back from the index
+        embedding_store = ChunkEmbeddingStore(embedding_service)
+        comparable_docs = [d for d in documents if d.text_content]
+
+        # Documents whose content was already analyzed reuse the stored vectors
+        reuse_service = ResultReuseService(session, embedding_service, get_ai_service())
+        reuse_sources = await reuse_service.find_sources(comparable_docs, batch_id)
+
+        if embedding_service.model:
+            reused_ids.update(await reuse_service.seed_embeddings(embedding_store, comparable_docs, reuse_sources))
+            # Encode every remaining chunk of the shard through the model in one batched pass
+            embedding_store.prefetch(comparable_docs)
+
+        # Winnowing fingerprints go into the inverted index here; every shard is
+        # indexed before the comparison stage looks anything up
+        if settings.WINNOWING_ENABLED:
+            await WinnowingService(session).index_documents(comparable_docs, batch.user_id)
+            await session.commit()
+
+        if embedding_service.model:
+            await corpus_search.clear_documents(comparable_docs)
+            await session.commit()
+            writer = BulkResultWriter(worker_runtime.session, batch_id=batch_id, stage="embedding")
+            for doc in comparable_docs:
                 try:
-                    doc.status = "processing"
-                    await session.commit()
-                    
-                    # AI Detection
-                    if analysis_type in ["ai", "both", "mixed"]:
-                        if doc.text_content:
-                            ai_result = ai_service.detect(doc.text_content, provider=provider, threshold=ai_threshold)
-                            doc.ai_score = ai_result.get("score", 0.0)
-                            doc.is_ai_generated = ai_result.get("is_ai", False)
-                            doc.ai_confidence = ai_result.get("confidence", 0.0)
-                            doc.ai_provider = ai_result.get("provider", "unknown")
-                            
-                            # Store detailed AI detection result in AIDetection table
-                            from app.models.ai_detection import AIDetection
-                            ai_detection_record = AIDetection(
-                                document_id=doc.id,
-                                model_version=ai_result.get("details", {}).get("model", "unknown"),
-                                probability=ai_result.get("score", 0.0),
-                                meta_data={
-                                    "provider": ai_result.get("provider", "unknown"),
-                                    "confidence": ai_result.get("confidence", 0.0),
-                                    "label": ai_result.get("label", "unknown"),
-                                    "details": ai_result.get("details", {})
-                                }
-                            )
-                            session.add(ai_detection_record)
-                    
-                    # Plagiarism Detection (semantic similarity)
-                    if analysis_type in ["plagiarism", "both", "mixed"]:
-                        if doc.text_content and embedding_service.model:
-                            # Generate embedding (average) for legacy compatibility/search
-                            embedding = embedding_service.generate_text_embedding(doc.text_content)
-                            doc.embedding = embedding
-                            
-                            # Find similar documents in batch using new PlagiarismService
-                            similar_results = await plagiarism_service.find_similar_in_batch(doc, batch_id)
-                            
-                            # Store comparisons
-                            for res in similar_results:
-                                comparison = Comparison(
-                                    doc_a=doc.id,
-                                    doc_b=res["document_id"],
-                                    similarity=res["similarity"],
-                                    matches=res.get("matches", [])  # Store detailed matches in JSONB field
-                                )
-                                session.add(comparison)
-                    
-                    doc.status = "completed"
-                    await session.commit()
+                    # Generate embedding (average) for legacy compatibility/search
+                    writer.update(doc.id, embedding=embedding_store.document_embedding(doc))
+                    # Index chunk vectors, for corpus search and for the comparison stage
+                    spans, chunk_embeddings = embedding_store.get(doc)
+                    for row in corpus_search.index_rows(doc, batch.user_id, spans, chunk_embeddings):
+                        writer.add(doc.id, Embedding, row)
+                    await writer.done(doc.id)
                 except Exception as e:
                     print(f"Error processing document {doc.id}: {e}")
-                    doc.status = "failed"
-                    await session.commit()
-            
-            # Update batch status
-            batch.status = "completed"
-            batch.processed_docs = len([d for d in documents if d.status == "completed"])
+                    writer.fail(doc.id)
+            await writer.flush()
+            print(f"Batch {batch_id} embedding writes: {writer.stats()}")
+
+    return {"reused": sorted(reused_ids)}
+
+
+@celery.task
+def detect_ai(batch_id: str, doc_ids: List[str], provider: str, ai_threshold: float) -> Dict[str, Any]:
+    """AI detection stage for one shard"""
+    return worker_runtime.run(_detect_ai_async(batch_id, doc_ids, provider, ai_threshold))
+
+
+async def _detect_ai_async(batch_id: str, doc_ids: List[str], provider: str, ai_threshold: float) -> Dict[str, Any]:
+    ai_service = get_ai_service()
+    reused_ids = set()
+    ai_usage = Counter()  # tokens spent on external providers
+    async with worker_runtime.session() as session:
+        batch = await session.get(Batch, batch_id)
+        if not batch:
+            print(f"Batch {batch_id} not found")
+            return {}
+
+        documents = await _load_shard(session, batch_id, doc_ids)
+        comparable_docs = [d for d in documents if d.text_content]
+
+        # Documents whose content was already analyzed reuse the stored AI verdicts
+        reuse_service = ResultReuseService(session, get_embedding_service(), ai_service)
+        reuse_sources = await reuse_service.find_sources(comparable_docs, batch_id)
+        batch_ai_results = {}  # content_hash -> AI result, for duplicates within this shard
+
+        # External providers are network-bound: issue their detections concurrently up front,
+        # bounded by the provider router's concurrency and rate limits
+        prefetched_ai = {}  # content_hash -> AI result
+        if provider in (ProviderType.OPENAI, ProviderType.TOGETHER):
+            pending = {}
+            for doc in comparable_docs:
+                if str(doc.id) not in reuse_sources:
+                    pending.setdefault(doc.content_hash, doc.text_content)
+            if settings.AI_PACKING_ENABLED:
+                # Chunks of many documents share each request; documents that still failed
+                # fall through to detect_async below, which applies the batch's provider policy
+                prefetched_ai, usage = await ai_service.detect_external_packed(pending, provider, ai_threshold)
+                ai_usage.update(usage)
+                prefetched_ai = {key: res for key, res in prefetched_ai.items() if res.get("label") != "Error"}
+            else:
+                results = await asyncio.gather(*[
+                    ai_service.detect_async(
+                        text,
+                        provider=provider,
+                        threshold=ai_threshold,
+                        policy=batch.provider_policy,
+                        fallback_provider=batch.fallback_provider
+                    )
+                    for text in pending.values()
+                ])
+                prefetched_ai = dict(zip(pending.keys(), results))
+                for res in results:
+                    ai_usage.update(res.get("details", {}).get("usage", {}))
+
+        # Process each document; results are written in bulk
+        writer = BulkResultWriter(worker_runtime.session, batch_id=batch_id, stage="ai")
+        for doc in documents:
+            try:
+                if doc.text_content:
+                    ai_result = batch_ai_results.get(doc.content_hash)
+                    if ai_result is None and str(doc.id) in reuse_sources:
+                        ai_result = await reuse_service.ai_result(reuse_sources[str(doc.id)], provider, ai_threshold)
+                    if ai_result is not None:
+                        reused_ids.add(str(doc.id))
+                    else:
+                        ai_result = prefetched_ai.pop(doc.content_hash, None)
+                        if ai_result is None:
+                            ai_result = await ai_service.detect_async(
+                                doc.text_content,
+                                provider=provider,
+                                threshold=ai_threshold,
+                                policy=batch.provider_policy,
+                                fallback_provider=batch.fallback_provider
+                            )
+                            ai_usage.update(ai_result.get("details", {}).get("usage", {}))
+                        batch_ai_results[doc.content_hash] = ai_result
+                    writer.update(
+                        doc.id,
+                        ai_score=ai_result.get("score", 0.0),
+                        is_ai_generated=ai_result.get("is_ai", False),
+                        ai_confidence=ai_result.get("confidence", 0.0),
+                        ai_provider=ai_result.get("provider", "unknown")
+                    )
+
+                    # Store detailed AI detection result in AIDetection table
+                    writer.add(doc.id, AIDetection, {
+                        "document_id": doc.id,
+                        "model_version": ai_result.get("details", {}).get("model", "unknown"),
+                        "probability": ai_result.get("score", 0.0),
+                        "meta_data": {
+                            "provider": ai_result.get("provider", "unknown"),
+                            "confidence": ai_result.get("confidence", 0.0),
+                            "label": ai_result.get("label", "unknown"),
+                            "cascade_stage": ai_result.get("details", {}).get("cascade", {}).get("stage"),
+                            "details": ai_result.get("details", {})
+                        }
+                    })
+
+                # Plagiarism documents stay "processing" until their comparisons are stored
+                if (batch.analysis_type or "plagiarism") not in PLAGIARISM_TYPES:
+                    await writer.done(doc.id, status="completed")
+                else:
+                    await writer.done(doc.id)
+            except Exception as e:
+                print(f"Error processing document {doc.id}: {e}")
+                writer.fail(doc.id)
+        await writer.flush()
+        print(f"Batch {batch_id} AI detection writes: {writer.stats()}")
+
+    return {"reused": sorted(reused_ids), "ai_usage": dict(ai_usage)}
+
+
+@celery.task
+def plan_comparisons(shard_results: List[Dict[str, Any]], batch_id: str, provider: str):
+    """Chord callback after analysis: prefilter the batch and fan the pairwise comparisons out"""
+    summary = {
+        "reused": sorted({doc_id for res in shard_results if res for doc_id in res.get("reused", [])}),
+        "ai_usage": dict(sum((Counter(res.get("ai_usage", {})) for res in shard_results if res), Counter())),
+        "provider": ProviderType(provider).value
+    }
+    shards = worker_runtime.run(_plan_comparisons_async(batch_id))
+    if not shards:
+        worker_runtime.run(_finalize_batch_async(batch_id, summary))
+        return
+
+    workflow = chord(
+        [compare_documents.si(batch_id, doc_ids, candidates) for doc_ids, candidates in shards],
+        finalize_batch.s(batch_id, summary)
+    )
+    workflow.on_error(mark_batch_failed.si(batch_id))
+    workflow.delay()
+
+
+async def _plan_comparisons_async(batch_id: str):
+    """
+    Comparison shards as (document ids, candidates). Documents are dealt out round-robin since
+    earlier documents have more later ones to be compared with. candidates maps each document
+    to the later documents it must be compared with, or is None for all of them.
+    """
+    async with worker_runtime.session() as session:
+        batch = await session.get(Batch, batch_id)
+        if not batch or (batch.analysis_type or "plagiarism") not in PLAGIARISM_TYPES:
+            return []
+
+        documents = (await session.execute(_ordered_documents(batch_id))).scalars().all()
+        pending = [doc for doc in documents if doc.status == "processing"]
+        if not pending:
+            return []
+        comparable_docs = [d for d in documents if d.text_content]
+
+        # Lexical MinHash/LSH prefilter: only candidate pairs get a semantic comparison
+        candidate_pairs = None
+        use_prefilter = batch.prefilter
+        if use_prefilter is None:
+            use_prefilter = len(comparable_docs) >= settings.PREFILTER_MIN_DOCS
+        if use_prefilter:
+            prefilter = MinHashPrefilter(
+                threshold=batch.prefilter_threshold or settings.PREFILTER_THRESHOLD,
+                num_perm=batch.prefilter_num_perm or settings.PREFILTER_NUM_PERM,
+                shingle_size=settings.PREFILTER_SHINGLE_SIZE
+            )
+            candidate_pairs = prefilter.candidate_pairs(comparable_docs)
+            print(f"Batch {batch_id} prefilter: {prefilter.stats(len(comparable_docs), len(candidate_pairs))}")
+
+        count = -(-len(pending) // max(settings.BATCH_SHARD_SIZE, 1))
+        shards = []
+        for k in range(count):
+            doc_ids = [str(doc.id) for doc in pending[k::count]]
+            candidates = None
+            if candidate_pairs is not None:
+                candidates = {doc_id: [] for doc_id in doc_ids}
+                for earlier, later in candidate_pairs:
+                    if earlier in candidates:
+                        candidates[earlier].append(later)
+            shards.append((doc_ids, candidates))
+        return shards
+
+
+@celery.task
+def compare_documents(batch_id: str, doc_ids: List[str], candidates: Optional[Dict[str, List[str]]] = None):
+    """Pairwise stage for one shard: each document against the batch documents after it, and the corpus"""
+    worker_runtime.run(_compare_documents_async(batch_id, doc_ids, candidates))
+
+
+async def _compare_documents_async(batch_id: str, doc_ids: List[str], candidates: Optional[Dict[str, List[str]]]):
+    embedding_service = get_embedding_service()
+    async with worker_runtime.session() as session:
+        batch = await session.get(Batch, batch_id)
+        if not batch:
+            print(f"Batch {batch_id} not found")
+            return
+
+        # Positions of the comparable documents in the batch order
+        result = await session.execute(
+            _ordered_documents(batch_id)
+            .with_only_columns(Document.id)
+            .where(func.length(func.coalesce(Document.text_content, "")) > 0)
+        )
+        order = [str(doc_id) for doc_id in result.scalars().all()]
+        position = {doc_id: i for i, doc_id in enumerate(order)}
+
+        result = await session.execute(_ordered_documents(batch_id).where(Document.id.in_(doc_ids)))
+        documents = result.scalars().all()
+
+        later_ids = {}
+        for doc in documents:
+            key = str(doc.id)
+            if key not in position:
+                continue
+            later = order[position[key] + 1:]
+            if candidates is not None:
+                wanted = set(candidates.get(key, []))
+                later = [doc_id for doc_id in later if doc_id in wanted]
+            later_ids[key] = later
+
+        needed = {doc_id for later in later_ids.values() for doc_id in later} - set(later_ids)
+        others = []
+        if needed:
+            others = (await session.execute(select(Document).where(Document.id.in_(needed)))).scalars().all()
+        docs_by_id = {str(doc.id): doc for doc in list(documents) + list(others)}
+
+        from app.services.plagiarism import PlagiarismService
+        plagiarism_service = PlagiarismService(session, embedding_service)
+        corpus_search = CorpusSearchService(session, embedding_service)
+        # Chunk vectors were encoded and indexed by the analysis stage
+        embedding_store = ChunkEmbeddingStore(embedding_service)
+        if embedding_service.model:
+            await corpus_search.load_embeddings(embedding_store, list(docs_by_id.values()))
+
+        winnowing = None
+        if settings.WINNOWING_ENABLED:
+            winnowing = WinnowingService(session)
+            await winnowing.load_print_counts(order)
+
+        writer = BulkResultWriter(worker_runtime.session, batch_id=batch_id, stage="compare")
+        for doc in documents:
+            if doc.status != "processing":
+                continue  # failed during analysis
+            try:
+                pair_results = []
+                key = str(doc.id)
+                if key in position:
+                    if embedding_service.model:
+                        # Score each unordered pair once: this document against the ones after it,
+                        # writing both directions from the same similarity matrix
+                        later_docs = [docs_by_id[doc_id] for doc_id in later_ids[key] if doc_id in docs_by_id]
+                        pair_results = plagiarism_service.compare_with_later(doc, later_docs, embedding_store)
+
+                        # Match against the owner's earlier batches
+                        if settings.CORPUS_SEARCH_ENABLED:
+                            spans, chunk_embeddings = embedding_store.get(doc)
+                            corpus_results = await corpus_search.find_similar_in_corpus(
+                                doc, spans, chunk_embeddings, batch.user_id, exclude_batch_id=batch_id
+                            )
+                            pair_results += [dict(res, doc_a=str(doc.id), doc_b=res["document_id"]) for res in corpus_results]
+
+                    if winnowing is not None:
+                        # Same-batch pairs follow the same once-per-pair schedule as above
+                        verbatim_results = await winnowing.find_copies(
+                            doc,
+                            batch.user_id,
+                            exclude_ids=order[:position[key]],
+                            bidirectional_ids=order[position[key] + 1:]
+                        )
+                        pair_results = merge_verbatim_results(pair_results, verbatim_results)
+
+                # Store comparisons, together with the document's status
+                for res in pair_results:
+                    writer.add(doc.id, Comparison, {
+                        "doc_a": uuid.UUID(str(res["doc_a"])),
+                        "doc_b": uuid.UUID(str(res["doc_b"])),
+                        "similarity": res["similarity"],
+                        "matches": res.get("matches", [])  # Store detailed matches in JSONB field
+                    })
+                await writer.done(doc.id, status="completed")
+            except Exception as e:
+                print(f"Error processing document {doc.id}: {e}")
+                writer.fail(doc.id)
+        await writer.flush()
+        print(f"Batch {batch_id} comparison writes: {writer.stats()}")
+
+
+@celery.task
+def finalize_batch(shard_results, batch_id: str, summary: Optional[Dict[str, Any]] = None):
+    """Chord callback once every stage is done: batch status and counters"""
+    worker_runtime.run(_finalize_batch_async(batch_id, summary))
+
+
+async def _finalize_batch_async(batch_id: str, summary: Optional[Dict[str, Any]] = None):
+    summary = summary or {}
+    async with worker_runtime.session() as session:
+        batch = await session.get(Batch, batch_id)
+        if not batch:
+            print(f"Batch {batch_id} not found")
+            return
+
+        # Update batch status
+        completed = await session.execute(
+            select(func.count()).select_from(Document).where(Document.batch_id == batch_id, Document.status == "completed")
+        )
+        batch.status = "completed"
+        batch.processed_docs = completed.scalar_one()
+        batch.reused_docs = len(summary.get("reused", []))
+        if summary.get("ai_usage"):
+            batch.meta_data = dict(batch.meta_data or {}, ai_usage=dict(summary["ai_usage"], provider=summary["provider"]))
+        await session.commit()
+        progress.publish(
+            batch_id,
+            "batch",
+            status="completed",
+            processed_docs=batch.processed_docs,
+            total_docs=batch.total_docs,
+            reused_docs=batch.reused_docs
+        )
+
+
+@celery.task
+def mark_batch_failed(batch_id: str):
+    """Error callback of the batch workflow: a stage task raised, so its chord will never complete"""
+    worker_runtime.run(_mark_batch_failed_async(batch_id))
+
+
+async def _mark_batch_failed_async(batch_id: str):
+    async with worker_runtime.session() as session:
+        batch = await session.get(Batch, batch_id)
+        if batch:
+            batch.status = "failed"
             await session.commit()
-    finally:
-        await engine.dispose()
+            progress.publish(batch_id, "batch", status="failed", processed_docs=batch.processed_docs, total_docs=batch.total_docs)
@@ -0,0 +1,143 @@
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import func, insert, update
+from app.core.config import settings
+from app.core.progress import progress
+from app.models.batch import Batch
+from app.models.document import Document
+
+
+class BulkResultWriter:
+    """
+    Buffers the results of a stage task per document and writes them in bulk: one multi-row
+    INSERT per table and one UPDATE-by-primary-key batch for the Document columns per flush.
+
+    Durability is per document. A document's rows and its Document updates (status included)
+    are buffered until done() or fail() and are always committed in the same transaction, so
+    a document is never 'completed' without its rows and never has rows while still
+    'processing'. When a flush fails, its documents are retried one at a time and only the
+    ones that still fail are marked 'failed'.
+
+    Flushes run on their own session, so a rollback never expires the objects the stage is
+    reading from its session.
+
+    With a batch_id, the batch's processed_docs is incremented in the same transaction as the
+    documents that completed, and a progress event is published for every written document.
+    """
+
+    def __init__(
+        self,
+        session_scope: Callable,
+        flush_docs: Optional[int] = None,
+        flush_rows: Optional[int] = None,
+        flush_seconds: Optional[float] = None,
+        batch_id: Optional[str] = None,
+        stage: Optional[str] = None
+    ):
+        self.session_scope = session_scope
+        self.batch_id = batch_id
+        self.stage = stage
+        self.flush_docs = flush_docs or settings.BULK_FLUSH_DOCS
+        self.flush_rows = flush_rows or settings.BULK_FLUSH_ROWS
+        self.flush_seconds = settings.BULK_FLUSH_SECONDS if flush_seconds is None else flush_seconds
+        self._open: Dict[str, Dict[str, Any]] = {}
+        self._ready: Dict[str, Dict[str, Any]] = {}
+        self._ready_rows = 0
+        self._last_flush = time.monotonic()
+        self.counters = {"flushes": 0, "documents": 0, "rows": 0, "failed_documents": 0}
+
+    def _entry(self, doc_id) -> Dict[str, Any]:
+        return self._open.setdefault(str(doc_id), {"rows": {}, "values": {}})
+
+    def add(self, doc_id, model, row: Dict[str, Any]):
+        """Buffer a row of model (e.g. Comparison) produced for the document"""
+        self._entry(doc_id)["rows"].setdefault(model, []).append(row)
+
+    def update(self, doc_id, **values):
+        """Buffer column updates for the Document itself"""
+        self._entry(doc_id)["values"].update(values)
+
+    async def done(self, doc_id, status: Optional[str] = None):
+        """The document's results are complete; they are written with the next flush"""
+        entry = self._open.pop(str(doc_id), {"rows": {}, "values": {}})
+        if status is not None:
+            entry["values"]["status"] = status
+        self._ready[str(doc_id)] = entry
+        self._ready_rows += sum(len(rows) for rows in entry["rows"].values())
+        if (
+            len(self._ready) >= self.flush_docs
+            or self._ready_rows >= self.flush_rows
+            or time.monotonic() - self._last_flush >= self.flush_seconds
+        ):
+            await self.flush()
+
+    def fail(self, doc_id):
+        """Drop the document's buffered results; it is written as 'failed'"""
+        self._open.pop(str(doc_id), None)
+        self._ready[str(doc_id)] = {"rows": {}, "values": {"status": "failed"}}
+        self.counters["failed_documents"] += 1
+
+    async def flush(self):
+        """Write every finished document. Call once more when the task is done."""
+        items = list(self._ready.items())
+        self._ready = {}
+        self._ready_rows = 0
+        self._last_flush = time.monotonic()
+        if not items:
+            return
+
+        try:
+            await self._commit(items)
+        except Exception as e:
+            print(f"Bulk flush of {len(items)} documents failed, writing them one by one: {e}")
+            for item in items:
+                try:
+                    await self._commit([item])
+                except Exception as doc_error:
+                    print(f"Error writing results of document {item[0]}: {doc_error}")
+                    self.counters["failed_documents"] += 1
+                    await self._commit([(item[0], {"rows": {}, "values": {"status": "failed"}})])
+
+    async def _commit(self, items: List[Tuple[str, Dict[str, Any]]]):
+        rows_by_model: Dict[Any, List[Dict[str, Any]]] = {}
+        for _, entry in items:
+            for model, rows in entry["rows"].items():
+                rows_by_model.setdefault(model, []).extend(rows)
+
+        # executemany needs the same columns in every parameter set
+        updates_by_columns: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for doc_id, entry in items:
+            if entry["values"]:
+                updates_by_columns.setdefault(tuple(sorted(entry["values"])), []).append(dict(entry["values"], id=uuid.UUID(doc_id)))
+
+        completed = sum(1 for _, entry in items if entry["values"].get("status") == "completed")
+        counts = None
+        async with self.session_scope() as session:
+            for model, rows in rows_by_model.items():
+                await session.execute(insert(model), rows)
+            for params in updates_by_columns.values():
+                await session.execute(update(Document), params)
+            if self.batch_id is not None and completed:
+                result = await session.execute(
+                    update(Batch)
+                    .where(Batch.id == uuid.UUID(str(self.batch_id)))
+                    .values(processed_docs=func.coalesce(Batch.processed_docs, 0) + completed)
+                    .returning(Batch.processed_docs, Batch.total_docs)
+                )
+                counts = result.one_or_none()
+            await session.commit()
+
+        self.counters["flushes"] += 1
+        self.counters["documents"] += len(items)
+        self.counters["rows"] += sum(len(rows) for rows in rows_by_model.values())
+
+        if self.batch_id is not None:
+            for doc_id, entry in items:
+                status = entry["values"].get("status", "processing")
+                progress.publish(self.batch_id, "document", document_id=doc_id, stage=self.stage, status=status)
+            if counts is not None:
+                progress.publish(self.batch_id, "progress", processed_docs=counts[0], total_docs=counts[1])
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.counters, buffered=len(self._open) + len(self._ready))
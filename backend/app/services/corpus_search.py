@@ -0,0 +1,208 @@
+import math
+from typing import List, Dict, Any, Optional
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, text, func
+from app.core.config import settings
+from app.models import Document, Embedding
+from app.services.embedding import EmbeddingService, ChunkEmbeddingStore
+from app.services.plagiarism import MATCH_THRESHOLD
+
+
+class CorpusSearchService:
+    """
+    Chunk-level vector index over every analyzed document, backed by pgvector.
+    Chunks are stored with their document and character span, and new documents
+    are matched against the owner's historical corpus with HNSW ANN queries.
+    """
+
+    # hnsw.ef_search can't go higher
+    MAX_EF_SEARCH = 1000
+
+    def __init__(self, db_session: AsyncSession, embedding_service: EmbeddingService):
+        self.db_session = db_session
+        self.embedding_service = embedding_service
+
+    async def index_document(self, document: Document, owner_id, spans, embeddings) -> int:
+        """Replace the stored chunk vectors of a document. Returns the number of rows written."""
+        await self.db_session.execute(delete(Embedding).where(Embedding.file_id == document.id))
+        if len(embeddings) == 0:
+            return 0
+
+        self.db_session.add_all([Embedding(**row) for row in self.index_rows(document, owner_id, spans, embeddings)])
+        return len(embeddings)
+
+    def index_rows(self, document: Document, owner_id, spans, embeddings) -> List[Dict[str, Any]]:
+        """Embedding rows of a document's chunks as dicts, for bulk inserts"""
+        return [
+            {
+                "file_id": document.id,
+                "vector": np.asarray(vector, dtype=np.float32),
+                "type": "text",
+                "chunk_index": i,
+                "start_offset": start,
+                "end_offset": end,
+                "owner_id": owner_id,
+                "batch_id": document.batch_id,
+                "model_name": self.embedding_service.model_name
+            }
+            for i, ((start, end), vector) in enumerate(zip(spans, embeddings))
+        ]
+
+    async def clear_documents(self, documents: List[Document]):
+        """Delete the stored chunk vectors of several documents before they are re-indexed in bulk"""
+        if documents:
+            await self.db_session.execute(delete(Embedding).where(Embedding.file_id.in_([doc.id for doc in documents])))
+
+    async def load_embeddings(self, store: ChunkEmbeddingStore, documents: List[Document]) -> List[str]:
+        """
+        Load the indexed chunk vectors of the given documents into a batch store, so a task
+        other than the one that encoded them can compare them. Returns the ids that were loaded.
+        """
+        ids = [doc.id for doc in documents]
+        if not ids:
+            return []
+
+        result = await self.db_session.execute(
+            select(Embedding.file_id, Embedding.vector, Embedding.start_offset, Embedding.end_offset)
+            .where(
+                Embedding.file_id.in_(ids),
+                Embedding.model_name == self.embedding_service.model_name
+            )
+            .order_by(Embedding.file_id, Embedding.chunk_index)
+        )
+        rows_by_doc: Dict[Any, list] = {}
+        for file_id, vector, start, end in result.all():
+            rows_by_doc.setdefault(file_id, []).append((vector, start, end))
+
+        loaded = []
+        for doc in documents:
+            rows = rows_by_doc.get(doc.id)
+            if not rows:
+                continue
+            spans = [(start, end) for _, start, end in rows]
+            store.put(doc, spans, np.ascontiguousarray([vector for vector, _, _ in rows], dtype=np.float32))
+            loaded.append(str(doc.id))
+        return loaded
+
+    async def _prepare_search(self, owner_id, k: int) -> bool:
+        """
+        Pick the search strategy for an owner. The owner filter is applied after the HNSW scan, so
+        for an owner with a small share of the table the ef_search candidates would mostly be other
+        users' rows. Owners with up to CORPUS_EXACT_MAX_ROWS chunks are searched exactly (returns True);
+        for larger owners ef_search is raised in proportion to the rows the filter discards.
+        """
+        limit = settings.CORPUS_EXACT_MAX_ROWS
+        owner_rows = (await self.db_session.execute(
+            select(func.count()).select_from(
+                select(Embedding.id)
+                .where(Embedding.owner_id == owner_id, Embedding.model_name == self.embedding_service.model_name)
+                .limit(limit + 1)
+                .subquery()
+            )
+        )).scalar_one()
+        if owner_rows <= limit:
+            return True
+
+        # owner_rows is a lower bound (the count stops at limit + 1), so this errs on the side of more candidates
+        total_rows = (await self.db_session.execute(
+            text("SELECT GREATEST(reltuples, 0)::bigint FROM pg_class WHERE relname = 'embeddings'")
+        )).scalar_one_or_none() or 0
+        needed = math.ceil(k * 2 * max(total_rows, owner_rows) / owner_rows)
+        ef_search = min(max(settings.CORPUS_EF_SEARCH, needed), self.MAX_EF_SEARCH)
+        await self.db_session.execute(text(f"SET LOCAL hnsw.ef_search = {int(ef_search)}"))
+        return False
+
+    async def find_similar_in_corpus(
+        self,
+        document: Document,
+        spans,
+        embeddings,
+        owner_id,
+        exclude_batch_id: Optional[str] = None,
+        k: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Find documents in the owner's corpus that share chunks with this document.
+        Returns results in the same shape as PlagiarismService.find_similar_in_batch.
+        """
+        if len(embeddings) == 0:
+            return []
+
+        k = k or settings.CORPUS_SEARCH_K
+        exact = await self._prepare_search(owner_id, k)
+
+        # best[doc_id][source_index] = (score, target_chunk_index, start, end)
+        best: Dict[Any, Dict[int, tuple]] = {}
+        for i, vector in enumerate(embeddings):
+            distance = Embedding.vector.cosine_distance(np.asarray(vector, dtype=np.float32))
+            if exact:
+                # Not the indexed expression, so the planner scans the owner's rows (owner_id index) exactly
+                distance = distance + 0.0
+            query = (
+                select(
+                    Embedding.file_id,
+                    Embedding.chunk_index,
+                    Embedding.start_offset,
+                    Embedding.end_offset,
+                    distance.label("distance")
+                )
+                .where(
+                    Embedding.owner_id == owner_id,
+                    Embedding.file_id != document.id,
+                    Embedding.model_name == self.embedding_service.model_name
+                )
+                .order_by(distance)
+                .limit(k)
+            )
+            if exclude_batch_id is not None:
+                query = query.where(Embedding.batch_id != exclude_batch_id)
+
+            for file_id, chunk_index, start, end, dist in (await self.db_session.execute(query)).all():
+                score = 1.0 - float(dist)
+                if score <= MATCH_THRESHOLD:
+                    continue
+                per_chunk = best.setdefault(file_id, {})
+                if i not in per_chunk or score > per_chunk[i][0]:
+                    per_chunk[i] = (score, chunk_index, start, end)
+
+        if not best:
+            return []
+
+        docs_result = await self.db_session.execute(
+            select(Document.id, Document.filename).where(Document.id.in_(best.keys()))
+        )
+        targets = {row.id: row for row in docs_result.all()}
+
+        results = []
+        for file_id, per_chunk in best.items():
+            target = targets.get(file_id)
+            if target is None:
+                continue
+            matches = []
+            total_similarity = 0.0
+            for i in sorted(per_chunk):
+                score, chunk_index, start, end = per_chunk[i]
+                matches.append({
+                    "score": round(score, 4),
+                    "source_index": i,
+                    "target_index": chunk_index,
+                    "source_start": spans[i][0],
+                    "source_end": spans[i][1],
+                    "target_start": start,
+                    "target_end": end
+                })
+                total_similarity += score
+
+            # Same normalization as batch comparisons: how much of this document is found in the target
+            similarity = round(total_similarity / len(embeddings), 4)
+            if similarity > 0.1:
+                results.append({
+                    "document_id": str(file_id),
+                    "filename": target.filename,
+                    "similarity": similarity,
+                    "matches": matches
+                })
+
+        results.sort(key=lambda x: x["similarity"], reverse=True)
+        return results
@@ -1,55 +1,253 @@
 import os
+import atexit
+import weakref
 import hashlib
+import importlib.util
+import logging
+from functools import lru_cache
+import numpy as np
+
+from app.core.config import settings
+from app.core.cache import get_cache
+from app.core.model_registry import model_registry
+
+# Probe only; sentence_transformers (and torch) are imported when the model is first loaded
+HAS_MODEL = importlib.util.find_spec("sentence_transformers") is not None
+
+logger = logging.getLogger(__name__)
+
+# Services whose multi-process encode pool is running, so shutdown can stop every pool
+_pooled_services = weakref.WeakSet()
+
+
+def embedding_cache():
+    """Process-wide chunk embedding cache keyed by (model name, chunk hash), or None if disabled"""
+    if not settings.EMBEDDING_CACHE_ENABLED:
+        return None
+    return get_cache(
+        "embeddings",
+        local_entries=settings.EMBEDDING_CACHE_LOCAL_ENTRIES,
+        shared_entries=settings.EMBEDDING_CACHE_SHARED_ENTRIES,
+        ttl=settings.EMBEDDING_CACHE_TTL,
+        encode=lambda vector: np.asarray(vector, dtype=np.float32).tobytes(),
+        decode=lambda raw: np.frombuffer(raw, dtype=np.float32)
+    )
 
-try:
-    from sentence_transformers import SentenceTransformer
-    HAS_MODEL = True
-except ImportError:
-    HAS_MODEL = False
 
 class EmbeddingService:
     def __init__(self, model_name="sentence-transformers/all-MiniLM-L6-v2"):
+        self.model_name = model_name
+        self.batch_size = settings.EMBEDDING_BATCH_SIZE
+        self._pool = None
+        self._pool_pid = None
+        self._pool_failed = False
+        self.cache = embedding_cache()
         if HAS_MODEL and not os.getenv("VERCEL"):
-            self.model = SentenceTransformer(model_name)
+            # Shared with every other EmbeddingService in this process
+            self.model = model_registry.sentence_transformer(model_name)
         else:
             self.model = None
 
     def chunk_text(self, text, chunk_size=500, overlap=50):
         """Split text into overlapping chunks"""
+        return [text[start:end] for start, end in self.chunk_spans(text, chunk_size, overlap)]
+
+    def chunk_spans(self, text, chunk_size=500, overlap=50):
+        """(start, end) character offsets of the chunks produced by chunk_text"""
         if not text:
             return []
-        chunks = []
+        spans = []
         for i in range(0, len(text), chunk_size - overlap):
-            chunks.append(text[i:i + chunk_size])
+            spans.append((i, min(i + chunk_size, len(text))))
             if i + chunk_size >= len(text):
                 break
-        return chunks
+        return spans
 
     def encode_chunks(self, text):
         """Generate embeddings for each chunk of text"""
         if not self.model:
             return [], []
-            
+
         chunks = self.chunk_text(text)
         if not chunks:
             return [], []
-            
-        embeddings = [self.model.encode(chunk) for chunk in chunks]
+
+        embeddings = self.encode_batch(chunks)
         return chunks, embeddings
 
+    def encode_many(self, texts):
+        """
+        Chunk and encode several texts with one pass through the model.
+        Returns a list of (spans, embeddings) per text, where spans are the chunks'
+        (start, end) offsets and the embeddings are row slices of a single
+        contiguous float32 matrix.
+        """
+        if not self.model:
+            return [([], []) for _ in texts]
+
+        spanned = [self.chunk_spans(text) for text in texts]
+        all_chunks = [text[start:end] for text, spans in zip(texts, spanned) for start, end in spans]
+        matrix = self.encode_batch(all_chunks)
+
+        results = []
+        offset = 0
+        for spans in spanned:
+            end = offset + len(spans)
+            results.append((spans, matrix[offset:end]) if spans else ([], []))
+            offset = end
+        return results
+
+    def encode_batch(self, chunks) -> np.ndarray:
+        """
+        Encode a flat list of chunks in mini-batches.
+        Chunks already in the embedding cache (repeated prompts, headers, templates)
+        skip the model; large remainders fan out to the multi-process pool when one is configured.
+        Returns a contiguous (len(chunks), dim) float32 matrix.
+        """
+        if not chunks:
+            dim = self.model.get_sentence_embedding_dimension() if self.model else 0
+            return np.empty((0, dim), dtype=np.float32)
+
+        if self.cache is None:
+            return self._encode(chunks)
+
+        keys = [self._cache_key(chunk) for chunk in chunks]
+        vectors = self.cache.get_many(keys)
+        missing = list(dict.fromkeys(chunk for chunk, key in zip(chunks, keys) if key not in vectors))
+        if missing:
+            encoded = self._encode(missing)
+            fresh = {self._cache_key(chunk): row.copy() for chunk, row in zip(missing, encoded)}
+            self.cache.set_many(fresh)
+            vectors.update(fresh)
+
+        return np.ascontiguousarray(np.stack([vectors[key] for key in keys]), dtype=np.float32)
+
+    def _cache_key(self, chunk: str) -> str:
+        return f"{self.model_name}:{hashlib.sha256(chunk.encode()).hexdigest()}"
+
+    def _encode(self, chunks) -> np.ndarray:
+        """Run chunks through the model, in-process or on the encode pool"""
+        pool = None
+        if len(chunks) >= settings.EMBEDDING_POOL_MIN_CHUNKS:
+            pool = self._get_pool()
+
+        if pool is not None:
+            embeddings = self.model.encode_multi_process(chunks, pool, batch_size=self.batch_size)
+        else:
+            embeddings = self.model.encode(
+                chunks,
+                batch_size=self.batch_size,
+                convert_to_numpy=True,
+                show_progress_bar=False,
+            )
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
+
+    def _get_pool(self):
+        """Start the multi-process encode pool on first use, if enabled"""
+        processes = settings.EMBEDDING_POOL_PROCESSES
+        if processes == 0 or self._pool_failed:
+            return None
+        if self._pool is None:
+            if processes < 0:
+                processes = os.cpu_count() or 1
+            try:
+                self._pool = self.model.start_multi_process_pool(target_devices=["cpu"] * processes)
+                self._pool_pid = os.getpid()
+                _pooled_services.add(self)
+                logger.info(f"Started embedding pool with {processes} processes.")
+            except Exception as e:
+                # Daemonic workers (Celery prefork) cannot spawn children
+                logger.warning(f"Embedding pool unavailable, encoding in-process: {e}")
+                self._pool_failed = True
+                return None
+        return self._pool
+
+    def close_pool(self):
+        """Stop the multi-process encode pool if one was started"""
+        if self._pool is not None:
+            # A forked child does not own its parent's pool processes
+            if self._pool_pid == os.getpid():
+                self.model.stop_multi_process_pool(self._pool)
+            self._pool = None
+            _pooled_services.discard(self)
+
     def generate_text_embedding(self, text):
         if not self.model:
             return []
-        
+
         # For long texts, we chunk and average the embeddings
         chunks, embeddings = self.encode_chunks(text)
-        if not embeddings:
+        return self.average_embedding(embeddings)
+
+    @staticmethod
+    def average_embedding(embeddings):
+        """Average chunk embeddings into a single document vector"""
+        if len(embeddings) == 0:
             return []
-            
-        import numpy as np
+
         avg_embedding = np.mean(embeddings, axis=0)
         return avg_embedding.tolist()
 
     @staticmethod
     def hash_content(content):
         return hashlib.sha256(content.encode()).hexdigest()
+
+
+def close_embedding_pools():
+    """Stop every encode pool started in this process (API shutdown, worker process shutdown, exit)"""
+    for service in list(_pooled_services):
+        try:
+            service.close_pool()
+        except Exception as e:
+            logger.warning(f"Failed to stop embedding pool: {e}")
+
+
+# Safety net for exits that skip the shutdown hooks
+atexit.register(close_embedding_pools)
+
+
+@lru_cache(maxsize=None)
+def get_embedding_service() -> EmbeddingService:
+    """Process-wide EmbeddingService for the default model, created on first use."""
+    return EmbeddingService()
+
+
+class ChunkEmbeddingStore:
+    """
+    Batch-scoped store of chunk spans and embeddings keyed by document id.
+    Each document is chunked and encoded once, then reused for every pairing
+    and for the averaged document embedding.
+    """
+
+    def __init__(self, embedding_service: EmbeddingService):
+        self.embedding_service = embedding_service
+        self._entries = {}
+
+    def prefetch(self, documents):
+        """
+        Encode every document not yet in the store in a single batched call.
+        Documents with identical text share one encoding.
+        """
+        pending = [doc for doc in documents if str(doc.id) not in self._entries]
+        if not pending:
+            return
+        texts = list(dict.fromkeys(doc.text_content for doc in pending))
+        encoded = dict(zip(texts, self.embedding_service.encode_many(texts)))
+        for doc in pending:
+            self._entries[str(doc.id)] = encoded[doc.text_content]
+
+    def put(self, document, spans, embeddings):
+        """Store precomputed chunk spans and embeddings for a document"""
+        self._entries[str(document.id)] = (spans, embeddings)
+
+    def get(self, document):
+        """Return (spans, embeddings) for a document, encoding it on first use"""
+        key = str(document.id)
+        if key not in self._entries:
+            self._entries[key] = self.embedding_service.encode_many([document.text_content])[0]
+        return self._entries[key]
+
+    def document_embedding(self, document):
+        """Averaged embedding for Document.embedding, built from the stored chunks"""
+        _, embeddings = self.get(document)
+        return self.embedding_service.average_embedding(embeddings)
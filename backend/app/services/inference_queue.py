@@ -0,0 +1,125 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class InferenceQueueFull(Exception):
+    """Raised when the queue already holds its maximum number of requests."""
+
+
+class MicroBatcher:
+    """
+    In-process inference queue that coalesces concurrent requests into batched forward passes.
+    Requests submit token windows; a single consumer on the event loop waits up to max_wait
+    for more work (or until max_batch windows are queued), then scores everything in one call
+    to score_fn on a dedicated inference thread. Admission is bounded by max_pending requests.
+    """
+
+    def __init__(self, score_fn: Callable[[List[Any]], List[float]], max_batch: int, max_wait_ms: float, max_pending: int):
+        self.score_fn = score_fn
+        self.max_batch = max(max_batch, 1)
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_pending = max_pending
+        self.pending = 0
+        self.counters = {"requests": 0, "rejected": 0, "batches": 0, "windows": 0, "largest_batch": 0}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ai-inference")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._consumer: Optional[asyncio.Task] = None
+
+    def admit(self):
+        """Reserve a request slot on the running loop. Raises InferenceQueueFull when saturated."""
+        if self.pending >= self.max_pending:
+            self.counters["rejected"] += 1
+            raise InferenceQueueFull(f"AI detection queue is full ({self.pending} requests pending)")
+        self._bind(asyncio.get_running_loop())
+        self.pending += 1
+        self.counters["requests"] += 1
+
+    def release(self):
+        self.pending -= 1
+
+    def _bind(self, loop: asyncio.AbstractEventLoop):
+        if self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._consumer = None
+        if self._consumer is None or self._consumer.done():
+            self._consumer = loop.create_task(self._consume())
+
+    async def submit(self, windows: List[Any]) -> List[float]:
+        """Queue windows for the next batched pass and wait for their scores."""
+        future = self._loop.create_future()
+        await self._queue.put((windows, future))
+        return await future
+
+    def score_threadsafe(self, windows: List[Any]) -> List[float]:
+        """Blocking submit for code running in a worker thread (e.g. AIDetectionService._detect_local)."""
+        return asyncio.run_coroutine_threadsafe(self.submit(windows), self._loop).result()
+
+    async def _consume(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            size = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                size += len(item[0])
+
+            windows = [w for item_windows, _ in batch for w in item_windows]
+            self.counters["batches"] += 1
+            self.counters["windows"] += len(windows)
+            self.counters["largest_batch"] = max(self.counters["largest_batch"], len(windows))
+            try:
+                scores = await loop.run_in_executor(self._executor, self.score_fn, windows)
+            except Exception as e:
+                logger.error(f"Batched inference failed for {len(batch)} requests: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            offset = 0
+            for item_windows, future in batch:
+                if not future.done():
+                    future.set_result(scores[offset:offset + len(item_windows)])
+                offset += len(item_windows)
+
+    def stats(self) -> Dict[str, Any]:
+        batches = self.counters["batches"]
+        return dict(
+            self.counters,
+            pending=self.pending,
+            queued=self._queue.qsize() if self._queue is not None else 0,
+            max_pending=self.max_pending,
+            avg_batch=round(self.counters["windows"] / batches, 2) if batches else 0.0
+        )
+
+
+@lru_cache(maxsize=None)
+def get_inference_queue() -> MicroBatcher:
+    """Process-wide micro-batching queue in front of the local AI detection model."""
+    from app.services.ai_detection import get_ai_service
+
+    service = get_ai_service()
+    return MicroBatcher(
+        lambda windows: service._score_windows(windows, batch_size=settings.AI_QUEUE_MAX_BATCH),
+        max_batch=settings.AI_QUEUE_MAX_BATCH,
+        max_wait_ms=settings.AI_QUEUE_MAX_WAIT_MS,
+        max_pending=settings.AI_QUEUE_MAX_PENDING
+    )
@@ -0,0 +1,110 @@
+import re
+import zlib
+from functools import lru_cache
+from typing import List, Set, Tuple, Dict, Any
+import numpy as np
+
+# Mersenne prime used for the universal hash family, as in standard MinHash implementations
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+class MinHashPrefilter:
+    """
+    Cheap lexical prefilter for batch comparisons.
+    Documents are reduced to word shingles, summarized as MinHash signatures and
+    bucketed with LSH banding; only pairs that share a bucket are worth a full
+    semantic comparison.
+    """
+
+    def __init__(self, threshold: float = 0.1, num_perm: int = 128, shingle_size: int = 3, seed: int = 1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = self.optimal_params(threshold, num_perm)
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+    def shingles(self, text: str) -> np.ndarray:
+        """Hashed word k-shingles of normalized text"""
+        tokens = _TOKEN_RE.findall((text or "").lower())
+        k = self.shingle_size
+        if len(tokens) < k:
+            grams = [" ".join(tokens)] if tokens else []
+        else:
+            grams = {" ".join(tokens[i:i + k]) for i in range(len(tokens) - k + 1)}
+        return np.fromiter((zlib.crc32(g.encode()) for g in grams), dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of a text; empty texts get an all-max signature that matches nothing"""
+        hashes = self.shingles(text)
+        if hashes.size == 0:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        # (a * x + b) mod p for every permutation/shingle pair, truncated to 32 bits
+        permuted = np.bitwise_and((np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME, _MAX_HASH)
+        return permuted.min(axis=0)
+
+    def candidate_pairs(self, documents) -> Set[Tuple[str, str]]:
+        """
+        Pairs of document ids that collide in at least one LSH band.
+        Each pair is returned once, ordered as (earlier, later) in the input.
+        """
+        ids = [str(doc.id) for doc in documents]
+        signatures = [self.signature(doc.text_content) for doc in documents]
+        empty = [bool((sig == _MAX_HASH).all()) for sig in signatures]
+
+        candidates = set()
+        for band in range(self.bands):
+            buckets: Dict[bytes, List[int]] = {}
+            start = band * self.rows
+            for idx, sig in enumerate(signatures):
+                if empty[idx]:
+                    continue
+                buckets.setdefault(sig[start:start + self.rows].tobytes(), []).append(idx)
+            for members in buckets.values():
+                for pos, i in enumerate(members):
+                    for j in members[pos + 1:]:
+                        candidates.add((ids[i], ids[j]))
+        return candidates
+
+    def stats(self, num_documents: int, num_candidates: int) -> Dict[str, Any]:
+        total_pairs = num_documents * (num_documents - 1) // 2
+        return {
+            "threshold": self.threshold,
+            "num_perm": self.num_perm,
+            "bands": self.bands,
+            "rows": self.rows,
+            "total_pairs": total_pairs,
+            "candidate_pairs": num_candidates,
+        }
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def optimal_params(threshold: float, num_perm: int, fp_weight: float = 0.5, fn_weight: float = 0.5):
+        """
+        Choose (bands, rows) minimizing the weighted false positive/negative area
+        of the LSH S-curve around the Jaccard threshold.
+        """
+        def integrate(f, a, b, steps=100):
+            if b <= a:
+                return 0.0
+            step = (b - a) / steps
+            xs = [a + step * (i + 0.5) for i in range(steps)]
+            return sum(f(x) for x in xs) * step
+
+        best, best_error = (1, num_perm), float("inf")
+        for bands in range(1, num_perm + 1):
+            max_rows = num_perm // bands
+            for rows in range(1, max_rows + 1):
+                def collide(s, b=bands, r=rows):
+                    return 1 - (1 - s ** r) ** b
+                false_positive = integrate(collide, 0.0, threshold)
+                false_negative = integrate(lambda s: 1 - collide(s), threshold, 1.0)
+                error = fp_weight * false_positive + fn_weight * false_negative
+                if error < best_error:
+                    best, best_error = (bands, rows), error
+        return best
@@ -1,16 +1,16 @@
 from fastapi import UploadFile
-from pdfminer.high_level import extract_text
-import docx
 import io
 import os
-from PIL import Image
-import pytesseract
-from pdf2image import convert_from_path
 import tempfile
+from typing import Optional
 
-async def extract_text_from_file(file: UploadFile) -> str:
+# Parser and OCR stacks are imported on first use so importing this module stays cheap
+
+async def extract_text_from_file(file: UploadFile, ocr: bool = True) -> Optional[str]:
     """
     Extracts text from a file, supporting .txt, .docx, .pdf, and image formats (.png, .jpg, .jpeg).
+    With ocr=False, files that need OCR (images, scanned PDFs) return None instead,
+    so the caller can hand them to the OCR worker queue.
     """
     content = None
     if isinstance(file, (bytes, bytearray)):
@@ -31,19 +31,25 @@ async def extract_text_from_file(file: UploadFile) -> str:
     filename = filename.lower()
 
     if filename.endswith(".docx"):
+        import docx
         doc = docx.Document(io.BytesIO(content))
         return " ".join([para.text for para in doc.paragraphs])
     
     elif filename.endswith(".pdf"):
+        from pdfminer.high_level import extract_text
         # Try standard extraction first
         text = extract_text(io.BytesIO(content))
         if len(text.strip()) < 10:  # Likely a scanned PDF
+            if not ocr:
+                return None
             # Use OCR for scanned PDFs
             with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
                 tmp.write(content)
                 tmp_path = tmp.name
             
             try:
+                import pytesseract
+                from pdf2image import convert_from_path
                 images = convert_from_path(tmp_path)
                 ocr_text = ""
                 for img in images:
@@ -56,6 +62,10 @@ async def extract_text_from_file(file: UploadFile) -> str:
 
     elif filename.endswith((".png", ".jpg", ".jpeg")):
         # Direct OCR for images
+        if not ocr:
+            return None
+        import pytesseract
+        from PIL import Image
         image = Image.open(io.BytesIO(content))
         return pytesseract.image_to_string(image)
 
@@ -1,14 +1,46 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import numpy as np
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from app.models import Document
-from app.services.embedding import EmbeddingService
+from app.services.embedding import EmbeddingService, ChunkEmbeddingStore
+
+# Minimum cosine similarity for a chunk pair to count as a match
+MATCH_THRESHOLD = 0.75
+
+
+def _normalize_rows(embeddings) -> np.ndarray:
+    """Stack embeddings into a matrix of unit rows; zero vectors stay zero."""
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms != 0)
+
+
+def resolve_match_text(matches: List[Dict[str, Any]], source_text: str, target_text: str) -> List[Dict[str, Any]]:
+    """
+    Slice source_chunk/target_chunk for offset-based matches from the document texts.
+    Matches stored before offsets were introduced already carry their text and pass through.
+    """
+    source_text = source_text or ""
+    target_text = target_text or ""
+    resolved = []
+    for match in matches or []:
+        if "source_start" in match and "source_chunk" not in match:
+            match = dict(
+                match,
+                source_chunk=source_text[match["source_start"]:match["source_end"]],
+                target_chunk=target_text[match["target_start"]:match["target_end"]]
+            )
+        resolved.append(match)
+    return resolved
+
 
 class PlagiarismService:
-    def __init__(self, db_session: AsyncSession = None):
+    def __init__(self, db_session: AsyncSession = None, embedding_service: Optional[EmbeddingService] = None):
         self.db_session = db_session
-        self.embedding_service = EmbeddingService()
+        self.embedding_service = embedding_service or EmbeddingService()
 
     def calculate_similarity(self, embedding_a, embedding_b) -> float:
         """Calculate cosine similarity between two embeddings"""
@@ -27,64 +59,133 @@ class PlagiarismService:
             
         return float(np.dot(vec_a, vec_b) / (norm_a * norm_b))
 
-    async def compare_documents(self, doc_a_text: str, doc_b_text: str) -> Dict[str, Any]:
+    def similarity_matrix(self, embeddings_a, embeddings_b) -> np.ndarray:
         """
-        Compare two documents using chunk-based analysis.
-        Returns overall similarity and specific matching passages.
+        Cosine similarity of every chunk in A against every chunk in B.
+        Each side is normalized once and the full matrix comes from a single matmul.
         """
-        chunks_a, embeddings_a = self.embedding_service.encode_chunks(doc_a_text)
-        chunks_b, embeddings_b = self.embedding_service.encode_chunks(doc_b_text)
-        
-        if not embeddings_a or not embeddings_b:
+        matrix_a = _normalize_rows(embeddings_a)
+        matrix_b = _normalize_rows(embeddings_b)
+        return matrix_a @ matrix_b.T
+
+    def match_chunks(self, spans_a, embeddings_a, spans_b, embeddings_b) -> Dict[str, Any]:
+        """
+        Score already-encoded chunks of A against B (how much of A is found in B).
+        Chunks are given as (start, end) spans of their document text.
+        """
+        if len(embeddings_a) == 0 or len(embeddings_b) == 0:
             return {"score": 0.0, "matches": []}
 
+        scores = self.similarity_matrix(embeddings_a, embeddings_b)
+        return self._best_matches(scores, spans_a, spans_b)
+
+    def compare_pair(self, spans_a, embeddings_a, spans_b, embeddings_b):
+        """
+        Score both directions of a pair from a single similarity matrix.
+        Returns (a_in_b, b_in_a), each shaped like match_chunks output.
+        """
+        if len(embeddings_a) == 0 or len(embeddings_b) == 0:
+            return {"score": 0.0, "matches": []}, {"score": 0.0, "matches": []}
+
+        scores = self.similarity_matrix(embeddings_a, embeddings_b)
+        return (
+            self._best_matches(scores, spans_a, spans_b),
+            self._best_matches(scores.T, spans_b, spans_a)
+        )
+
+    def compare_with_later(
+        self,
+        document: Document,
+        later_documents: List[Document],
+        embedding_store: ChunkEmbeddingStore
+    ) -> List[Dict[str, Any]]:
+        """
+        Compare a document with the batch documents scheduled after it.
+        Walking the batch in order this way scores every unordered pair exactly once;
+        both directions are returned as separate entries with doc_a/doc_b set.
+        """
+        spans_a, embeddings_a = embedding_store.get(document)
+
+        results = []
+        for other_doc in later_documents:
+            spans_b, embeddings_b = embedding_store.get(other_doc)
+            a_in_b, b_in_a = self.compare_pair(spans_a, embeddings_a, spans_b, embeddings_b)
+            for source, target, comparison in ((document, other_doc, a_in_b), (other_doc, document, b_in_a)):
+                if comparison["score"] > 0.1: # Filter low similarity
+                    results.append({
+                        "doc_a": str(source.id),
+                        "doc_b": str(target.id),
+                        "similarity": comparison["score"],
+                        "matches": comparison["matches"]
+                    })
+        return results
+
+    def _best_matches(self, scores: np.ndarray, spans_a, spans_b) -> Dict[str, Any]:
+        # argmax keeps the first index on ties, same as a strict ">" scan over B
+        best_idx = scores.argmax(axis=1)
+        best_scores = scores[np.arange(len(best_idx)), best_idx]
+        matched = np.flatnonzero(best_scores > MATCH_THRESHOLD)
+
         matches = []
         total_similarity = 0.0
-        
-        # Compare every chunk in A against every chunk in B
-        # This is O(N*M), fine for reasonable document sizes
-        # For production with large docs, use FAISS or pgvector for chunk search
-        
-        for i, emb_a in enumerate(embeddings_a):
-            best_match_score = 0.0
-            best_match_idx = -1
-            
-            for j, emb_b in enumerate(embeddings_b):
-                score = self.calculate_similarity(emb_a, emb_b)
-                if score > best_match_score:
-                    best_match_score = score
-                    best_match_idx = j
-            
-            # Threshold for a "match"
-            if best_match_score > 0.75:
-                matches.append({
-                    "source_chunk": chunks_a[i],
-                    "target_chunk": chunks_b[best_match_idx],
-                    "score": round(best_match_score, 4),
-                    "source_index": i,
-                    "target_index": best_match_idx
-                })
-                total_similarity += best_match_score
+        for i in matched.tolist():
+            j = int(best_idx[i])
+            score = float(best_scores[i])
+            # Matches keep offsets only; text is sliced from the documents when results are read
+            matches.append({
+                "score": round(score, 4),
+                "source_index": i,
+                "target_index": j,
+                "source_start": spans_a[i][0],
+                "source_end": spans_a[i][1],
+                "target_start": spans_b[j][0],
+                "target_end": spans_b[j][1]
+            })
+            total_similarity += score
 
         # Normalize overall score
         # Simple approach: (sum of matched chunk scores) / (total chunks in A)
         # This represents "how much of A is found in B"
-        overall_score = total_similarity / len(chunks_a) if chunks_a else 0.0
+        overall_score = total_similarity / len(spans_a) if spans_a else 0.0
 
         return {
             "score": round(overall_score, 4),
             "matches": matches,
             "details": {
-                "chunks_a": len(chunks_a),
-                "chunks_b": len(chunks_b)
+                "chunks_a": len(spans_a),
+                "chunks_b": len(spans_b)
             }
         }
 
-    async def find_similar_in_batch(self, document: Document, batch_id: str) -> List[Dict[str, Any]]:
-        """Find similar documents within the same batch"""
+    async def compare_documents(self, doc_a_text: str, doc_b_text: str) -> Dict[str, Any]:
+        """
+        Compare two documents using chunk-based analysis.
+        Returns overall similarity and specific matching passages.
+        """
+        spans_a, embeddings_a = self.embedding_service.encode_many([doc_a_text])[0]
+        spans_b, embeddings_b = self.embedding_service.encode_many([doc_b_text])[0]
+
+        # Compare every chunk in A against every chunk in B as one matrix product.
+        # Still O(N*M) work, but in BLAS rather than per-pair Python calls.
+        # For production with large docs, use FAISS or pgvector for chunk search
+        return self.match_chunks(spans_a, embeddings_a, spans_b, embeddings_b)
+
+    async def find_similar_in_batch(
+        self,
+        document: Document,
+        batch_id: str,
+        embedding_store: Optional[ChunkEmbeddingStore] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Find similar documents within the same batch.
+        Pass the batch's embedding_store so each document is only encoded once.
+        """
         if not self.db_session:
             raise ValueError("Database session required for batch search")
 
+        if embedding_store is None:
+            embedding_store = ChunkEmbeddingStore(self.embedding_service)
+
         # Get all other docs in batch
         # In production, use pgvector similarity search on chunks
         # Here we iterate for detailed comparison
@@ -95,9 +196,12 @@ class PlagiarismService:
         result = await self.db_session.execute(query)
         other_docs = result.scalars().all()
         
+        spans_a, embeddings_a = embedding_store.get(document)
+
         results = []
         for other_doc in other_docs:
-            comparison = await self.compare_documents(document.text_content, other_doc.text_content)
+            spans_b, embeddings_b = embedding_store.get(other_doc)
+            comparison = self.match_chunks(spans_a, embeddings_a, spans_b, embeddings_b)
             if comparison["score"] > 0.1: # Filter low similarity
                 results.append({
                     "document_id": str(other_doc.id),
@@ -0,0 +1,113 @@
+from typing import List, Dict, Any, Optional
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from app.models import Document, Embedding, AIDetection
+from app.services.embedding import EmbeddingService, ChunkEmbeddingStore
+from app.services.ai_detection import AIDetectionService
+
+
+class ResultReuseService:
+    """
+    Serves documents whose exact content was already analyzed from stored results.
+    Documents are matched on Document.content_hash; chunk vectors are reused only
+    for the same embedding model, AI verdicts only for the same provider and model.
+    """
+
+    def __init__(self, db_session: AsyncSession, embedding_service: EmbeddingService, ai_service: AIDetectionService):
+        self.db_session = db_session
+        self.embedding_service = embedding_service
+        self.ai_service = ai_service
+
+    async def find_sources(self, documents: List[Document], batch_id) -> Dict[str, Document]:
+        """
+        Fill missing content hashes and map each document id to the most recent
+        completed document from another batch with the same content.
+        """
+        for doc in documents:
+            if not doc.content_hash and doc.text_content:
+                doc.content_hash = EmbeddingService.hash_content(doc.text_content)
+
+        hashes = {doc.content_hash for doc in documents if doc.content_hash}
+        if not hashes:
+            return {}
+
+        result = await self.db_session.execute(
+            select(Document)
+            .where(
+                Document.content_hash.in_(hashes),
+                Document.batch_id != batch_id,
+                Document.status == "completed"
+            )
+            .order_by(Document.created_at.desc())
+        )
+        latest: Dict[str, Document] = {}
+        for source in result.scalars().all():
+            latest.setdefault(source.content_hash, source)
+
+        return {str(doc.id): latest[doc.content_hash] for doc in documents if doc.content_hash in latest}
+
+    async def seed_embeddings(self, store: ChunkEmbeddingStore, documents: List[Document], sources: Dict[str, Document]) -> List[str]:
+        """
+        Load stored chunk vectors of the source documents into the batch store so those
+        documents skip the transformer. Returns the ids of the documents that were seeded.
+        """
+        source_ids = {sources[str(doc.id)].id for doc in documents if str(doc.id) in sources}
+        if not source_ids:
+            return []
+
+        result = await self.db_session.execute(
+            select(Embedding.file_id, Embedding.vector, Embedding.start_offset, Embedding.end_offset)
+            .where(
+                Embedding.file_id.in_(source_ids),
+                Embedding.model_name == self.embedding_service.model_name
+            )
+            .order_by(Embedding.file_id, Embedding.chunk_index)
+        )
+        rows_by_source: Dict[Any, list] = {}
+        for file_id, vector, start, end in result.all():
+            rows_by_source.setdefault(file_id, []).append((vector, start, end))
+
+        seeded = []
+        for doc in documents:
+            source = sources.get(str(doc.id))
+            rows = rows_by_source.get(source.id) if source is not None else None
+            if not rows:
+                continue
+            # Same content hash, so the source's spans apply to this document unchanged
+            spans = [(start, end) for _, start, end in rows]
+            matrix = np.ascontiguousarray([vector for vector, _, _ in rows], dtype=np.float32)
+            store.put(doc, spans, matrix)
+            seeded.append(str(doc.id))
+        return seeded
+
+    async def ai_result(self, source: Document, provider: str, threshold: float) -> Optional[Dict[str, Any]]:
+        """
+        Rebuild an AI detection result from the source document's stored record.
+        The raw probability is reused; the verdict is re-applied with this batch's threshold.
+        None when the stored run is not conclusive for that threshold (adaptive early stop,
+        cascade stage decisions), so the document is scored again.
+        """
+        result = await self.db_session.execute(
+            select(AIDetection)
+            .where(
+                AIDetection.document_id == source.id,
+                AIDetection.model_version == self.ai_service.model_version(provider),
+                AIDetection.meta_data["provider"].astext == provider
+            )
+            .order_by(AIDetection.created_at.desc())
+            .limit(1)
+        )
+        record = result.scalar_one_or_none()
+        if record is None:
+            return None
+
+        meta = record.meta_data or {}
+        score = record.probability or 0.0
+        return self.ai_service.result_for_threshold(
+            score,
+            meta.get("confidence", round(abs(score - 0.5) * 2, 4)),
+            dict(meta.get("details", {}), reused_from=str(source.id)),
+            meta.get("provider", provider),
+            threshold
+        )
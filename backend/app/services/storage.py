@@ -29,6 +29,13 @@ class StorageService:
                 f.write(content)
             return path
 
+    def load(self, filename) -> bytes:
+        if self.storage_type == "s3":
+            return self.s3.get_object(Bucket=self.bucket_name, Key=filename)["Body"].read()
+        else:
+            with open(os.path.join(self.upload_dir, filename), "rb") as f:
+                return f.read()
+
     def get_presigned_url(self, filename):
         if self.storage_type == "s3":
             return self.s3.generate_presigned_url(
@@ -0,0 +1,244 @@
+import hashlib
+from collections import deque
+from typing import List, Dict, Any, Tuple, Iterable
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, insert, func, distinct
+from app.core.config import settings
+from app.models import Document, Fingerprint
+
+_LOOKUP_SLICE = 5000
+
+
+def normalize(text: str) -> Tuple[str, List[int]]:
+    """
+    Lower-case the text and drop everything but letters and digits, so whitespace,
+    punctuation and case edits don't break a match.
+    Returns the normalized string and, per normalized character, its offset in the original.
+    """
+    chars = []
+    offsets = []
+    for i, ch in enumerate(text or ""):
+        if ch.isalnum():
+            chars.append(ch.lower())
+            offsets.append(i)
+    return "".join(chars), offsets
+
+
+def winnow(hashes: List[int], window: int) -> List[int]:
+    """
+    Robust winnowing: in every window of consecutive k-gram hashes pick the minimum
+    (rightmost on ties) and record each selected position once.
+    Returns the selected k-gram positions in order.
+    """
+    if len(hashes) <= window:
+        return [min(range(len(hashes)), key=lambda i: (hashes[i], -i))] if hashes else []
+
+    selected = []
+    candidates = deque()  # positions with increasing hash values
+    for i, h in enumerate(hashes):
+        while candidates and hashes[candidates[-1]] >= h:
+            candidates.pop()
+        candidates.append(i)
+        if candidates[0] <= i - window:
+            candidates.popleft()
+        if i >= window - 1 and (not selected or selected[-1] != candidates[0]):
+            selected.append(candidates[0])
+    return selected
+
+
+class WinnowingService:
+    """
+    MOSS-style verbatim copy detection.
+    Text is normalized, hashed into k-grams and winnowed into fingerprints that are
+    stored in an inverted index (fingerprint -> document/offset), so copies are found
+    across the owner's corpus with indexed lookups instead of pairwise scans.
+    """
+
+    def __init__(self, db_session: AsyncSession, k: int = None, window: int = None, max_doc_freq: int = None):
+        self.db_session = db_session
+        self.k = k or settings.WINNOW_K
+        self.window = window or settings.WINNOW_WINDOW
+        self.max_doc_freq = settings.WINNOW_MAX_DOC_FREQ if max_doc_freq is None else max_doc_freq
+        self._fingerprints: Dict[str, List[Tuple[int, int, int]]] = {}
+        self._print_counts: Dict[str, int] = {}
+
+    def fingerprint(self, text: str) -> List[Tuple[int, int, int]]:
+        """Winnowed fingerprints of a text as (hash, start, end) character spans of the original"""
+        normalized, offsets = normalize(text)
+        if len(normalized) < self.k:
+            return []
+
+        hashes = [
+            int.from_bytes(
+                hashlib.blake2b(normalized[i:i + self.k].encode(), digest_size=8).digest(), "big", signed=True
+            )
+            for i in range(len(normalized) - self.k + 1)
+        ]
+        return [
+            (hashes[pos], offsets[pos], offsets[pos + self.k - 1] + 1)
+            for pos in winnow(hashes, self.window)
+        ]
+
+    def document_fingerprints(self, document: Document) -> List[Tuple[int, int, int]]:
+        key = str(document.id)
+        if key not in self._fingerprints:
+            self._fingerprints[key] = self.fingerprint(document.text_content)
+        return self._fingerprints[key]
+
+    async def index_documents(self, documents: Iterable[Document], owner_id) -> int:
+        """Replace the stored fingerprints of the given documents. Returns the number of rows written."""
+        documents = list(documents)
+        if not documents:
+            return 0
+        await self.db_session.execute(
+            delete(Fingerprint).where(Fingerprint.document_id.in_([doc.id for doc in documents]))
+        )
+        rows = [
+            {
+                "document_id": doc.id,
+                "owner_id": owner_id,
+                "hash": h,
+                "start_offset": start,
+                "end_offset": end
+            }
+            for doc in documents
+            for h, start, end in self.document_fingerprints(doc)
+        ]
+        if rows:
+            await self.db_session.execute(insert(Fingerprint), rows)
+        return len(rows)
+
+    async def load_print_counts(self, document_ids: Iterable) -> None:
+        """Fingerprint counts of documents indexed elsewhere (e.g. by another task), for reverse entries"""
+        ids = [i for i in document_ids if str(i) not in self._fingerprints]
+        for i in range(0, len(ids), _LOOKUP_SLICE):
+            result = await self.db_session.execute(
+                select(Fingerprint.document_id, func.count())
+                .where(Fingerprint.document_id.in_(ids[i:i + _LOOKUP_SLICE]))
+                .group_by(Fingerprint.document_id)
+            )
+            self._print_counts.update({str(doc_id): count for doc_id, count in result.all()})
+
+    def _print_count(self, document_id: str) -> int:
+        if document_id in self._fingerprints:
+            return len(self._fingerprints[document_id])
+        return self._print_counts.get(document_id, 0)
+
+    async def find_copies(
+        self,
+        document: Document,
+        owner_id,
+        exclude_ids: Iterable[str] = (),
+        bidirectional_ids: Iterable[str] = ()
+    ) -> List[Dict[str, Any]]:
+        """
+        Look up the document's fingerprints in the inverted index. Fingerprints held by more
+        than max_doc_freq of the owner's documents (boilerplate) are skipped before any pair is formed.
+        Returns comparison entries (doc_a, doc_b, similarity, matches) with offset-based
+        matches in the Comparison.matches format, and similarity = share of doc_a's fingerprints found
+        in doc_b. For targets in bidirectional_ids (which must have been indexed by this
+        service or counted with load_print_counts) the reverse direction is derived from the same hits.
+        """
+        source_prints = self.document_fingerprints(document)
+        if not source_prints:
+            return []
+
+        exclude_ids = {str(i) for i in exclude_ids} | {str(document.id)}
+        bidirectional_ids = {str(i) for i in bidirectional_ids}
+
+        by_hash: Dict[int, List[Tuple[int, int]]] = {}
+        for h, start, end in source_prints:
+            by_hash.setdefault(h, []).append((start, end))
+
+        # hits[target_id] = [(source_start, source_end, target_start, target_end), ...]
+        hits: Dict[str, List[Tuple[int, int, int, int]]] = {}
+        unique_hashes = list(by_hash.keys())
+        # Slice the IN list to stay under the driver's bind parameter limit on long documents
+        for i in range(0, len(unique_hashes), _LOOKUP_SLICE):
+            hash_slice = unique_hashes[i:i + _LOOKUP_SLICE]
+            if self.max_doc_freq:
+                hash_slice = await self._drop_common(hash_slice, owner_id)
+                if not hash_slice:
+                    continue
+            result = await self.db_session.execute(
+                select(Fingerprint.document_id, Fingerprint.hash, Fingerprint.start_offset, Fingerprint.end_offset)
+                .where(Fingerprint.owner_id == owner_id, Fingerprint.hash.in_(hash_slice))
+            )
+            for target_id, h, start, end in result.all():
+                target_id = str(target_id)
+                if target_id in exclude_ids:
+                    continue
+                for source_start, source_end in by_hash[h]:
+                    hits.setdefault(target_id, []).append((source_start, source_end, start, end))
+
+        results = []
+        for target_id, spans in hits.items():
+            if len(spans) < settings.WINNOW_MIN_MATCHES:
+                continue
+            results.append(self._entry(str(document.id), target_id, spans, len(source_prints)))
+            if target_id in bidirectional_ids and self._print_count(target_id):
+                reverse = [(ts, te, ss, se) for ss, se, ts, te in spans]
+                results.append(self._entry(target_id, str(document.id), reverse, self._print_count(target_id)))
+        return results
+
+    async def _drop_common(self, hashes: List[int], owner_id) -> List[int]:
+        """The hashes held by at most max_doc_freq of the owner's documents"""
+        result = await self.db_session.execute(
+            select(Fingerprint.hash)
+            .where(Fingerprint.owner_id == owner_id, Fingerprint.hash.in_(hashes))
+            .group_by(Fingerprint.hash)
+            .having(func.count(distinct(Fingerprint.document_id)) > self.max_doc_freq)
+        )
+        common = set(result.scalars().all())
+        return [h for h in hashes if h not in common]
+
+    def _entry(self, doc_a, doc_b, spans, total_prints) -> Dict[str, Any]:
+        matched = len({(ss, se) for ss, se, _, _ in spans})
+        matches = [
+            {
+                "score": 1.0,
+                "source_index": None,
+                "target_index": None,
+                "source_start": ss,
+                "source_end": se,
+                "target_start": ts,
+                "target_end": te,
+                "type": "verbatim"
+            }
+            for ss, se, ts, te in self._merge_spans(spans)
+        ]
+        return {
+            "doc_a": doc_a,
+            "doc_b": doc_b,
+            "similarity": round(min(matched / total_prints, 1.0), 4),
+            "matches": matches
+        }
+
+    def _merge_spans(self, spans):
+        """Merge fingerprint hits that run in parallel in both texts into passages"""
+        merged = []
+        for ss, se, ts, te in sorted(spans):
+            if merged:
+                ms, me, mts, mte = merged[-1]
+                # Continue the passage while the next hit overlaps it in both texts
+                if ss <= me and mts <= ts <= mte:
+                    merged[-1] = (ms, max(me, se), mts, max(mte, te))
+                    continue
+            merged.append((ss, se, ts, te))
+        return merged
+
+
+def merge_verbatim_results(semantic_results: List[Dict[str, Any]], verbatim_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Fold verbatim hits into semantic comparison entries keyed by (doc_a, doc_b).
+    Matches are concatenated and the pair keeps the higher of the two similarities.
+    """
+    merged = {(res["doc_a"], res["doc_b"]): dict(res, matches=list(res.get("matches", []))) for res in semantic_results}
+    for res in verbatim_results:
+        key = (res["doc_a"], res["doc_b"])
+        if key in merged:
+            merged[key]["matches"] += res["matches"]
+            merged[key]["similarity"] = max(merged[key]["similarity"], res["similarity"])
+        else:
+            merged[key] = res
+    return list(merged.values())
@@ -0,0 +1,54 @@
+import pytest
+
+from app.core.config import settings
+from app.core.provider_router import ProviderRouter, ProviderType
+from tests.stub_provider import StubProvider
+
+
+@pytest.fixture
+def stub_provider():
+    """Factory for stub providers that are stopped after the test"""
+    stubs = []
+
+    def make(**kwargs) -> StubProvider:
+        stub = StubProvider(**kwargs).start()
+        stubs.append(stub)
+        return stub
+
+    yield make
+    for stub in stubs:
+        stub.stop()
+
+
+@pytest.fixture
+def provider_settings(monkeypatch):
+    """Fast, deterministic provider settings: no retries, no rate limit, short breaker cooldown"""
+    for name, value in {
+        "EXTERNAL_AI_MAX_RETRIES": 0,
+        "EXTERNAL_AI_RATE_LIMIT": 0,
+        "EXTERNAL_AI_BACKOFF_BASE": 0.01,
+        "EXTERNAL_AI_TIMEOUT": 5,
+        "AI_BREAKER_CONSECUTIVE_FAILURES": 3,
+        "AI_BREAKER_MIN_CALLS": 100,
+        "AI_BREAKER_COOLDOWN": 0.2,
+        "AI_CACHE_ENABLED": False,
+    }.items():
+        monkeypatch.setattr(settings, name, value)
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("TOGETHER_API_KEY", "test-key")
+    return settings
+
+
+@pytest.fixture
+def make_router(provider_settings):
+    """Router whose external providers point at the given stubs"""
+
+    def make(openai: StubProvider, together: StubProvider = None) -> ProviderRouter:
+        router = ProviderRouter()
+        router.BASE_URLS = {
+            ProviderType.OPENAI: openai.url,
+            ProviderType.TOGETHER: (together or openai).url,
+        }
+        return router
+
+    return make
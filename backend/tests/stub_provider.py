@@ -0,0 +1,176 @@
+"""
+Fault-injecting stand-in for an OpenAI-compatible chat completions API.
+
+Used by the tests, and runnable on its own to exercise the provider router locally:
+
+    python -m tests.stub_provider --port 8099 --latency 0.3 --error-rate 0.2
+
+then start the API or a worker with OPENAI_BASE_URL=http://127.0.0.1:8099/v1 and any OPENAI_API_KEY.
+Answers both single-text prompts ({"score", "reasoning"}) and packed prompts ({"results": [...]}).
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Set
+
+
+class StubProvider:
+    """
+    Threaded HTTP server with configurable latency, random error rate and scripted failures.
+    Counts requests, distinct client connections and the peak number of requests in flight.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        score: float = 0.8,
+        port: int = 0,
+        seed: Optional[int] = None
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.score = score
+        self.drop_ids: Set[str] = set()  # packed item ids left out of the answers
+        self.requests = 0
+        self.connections: Set[tuple] = set()
+        self.statuses = []
+        self.request_times = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._scripted = deque()  # (status, retry_after) for the next requests
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def fail_next(self, count: int = 1, status: int = 503, retry_after: Optional[float] = None):
+        """Answer the next count requests with status (and a Retry-After header when given)"""
+        with self._lock:
+            self._scripted.extend([(status, retry_after)] * count)
+
+    def start(self) -> "StubProvider":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _fault(self):
+        with self._lock:
+            if self._scripted:
+                return self._scripted.popleft()
+        if self.error_rate and self._random.random() < self.error_rate:
+            return self.error_status, None
+        return None
+
+    def _answer(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        content = request["messages"][-1]["content"]
+        try:
+            payload = json.loads(content)
+        except ValueError:
+            payload = None
+        if isinstance(payload, dict) and "items" in payload:
+            answer = {"results": [
+                {"id": item["id"], "score": self.score, "reasoning": "stub"}
+                for item in payload["items"] if str(item["id"]) not in self.drop_ids
+            ]}
+        else:
+            answer = {"score": self.score, "reasoning": "stub"}
+
+        prompt_tokens = sum(len(m["content"]) for m in request["messages"]) // 4
+        return {
+            "id": f"chatcmpl-stub-{self.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": json.dumps(answer)},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 10, "total_tokens": prompt_tokens + 10}
+        }
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is observable
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with stub._lock:
+                    stub.requests += 1
+                    stub.connections.add(self.client_address)
+                    stub.request_times.append(time.monotonic())
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                try:
+                    if stub.latency:
+                        time.sleep(stub.latency)
+                    fault = stub._fault()
+                    if not self.path.endswith("/chat/completions"):
+                        self._send(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+                    elif fault is not None:
+                        status, retry_after = fault
+                        headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+                        self._send(status, {"error": {"message": f"stub error {status}", "type": "stub_error"}}, headers)
+                    else:
+                        self._send(200, stub._answer(json.loads(body)), {"x-ratelimit-remaining-requests": "100"})
+                finally:
+                    with stub._lock:
+                        stub.in_flight -= 1
+
+            def _send(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+                data = json.dumps(payload).encode()
+                with stub._lock:
+                    stub.statuses.append(status)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fault-injecting OpenAI-compatible stub provider")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--score", type=float, default=0.8, help="AI score in every answer")
+    args = parser.parse_args()
+
+    stub = StubProvider(args.latency, args.error_rate, args.error_status, args.score, port=args.port)
+    print(f"Stub provider on {stub.url} (latency {args.latency}s, error rate {args.error_rate})")
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        stub.stop()
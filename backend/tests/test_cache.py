@@ -0,0 +1,109 @@
+import asyncio
+import threading
+
+import redis
+
+from app.core import cache
+from app.core.cache import RedisConnection, TieredCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FlakyRedis:
+    """Stands in for redis.Redis.from_url: the first `failures` connects fail"""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.attempts = 0
+
+    def __call__(self, url, **kwargs):
+        self.attempts += 1
+        connect = self
+
+        class Client:
+            def ping(self):
+                if connect.attempts <= connect.failures:
+                    raise redis.ConnectionError("connection refused")
+                return True
+
+        return Client()
+
+
+def test_failed_connect_is_retried_with_backoff(monkeypatch):
+    clock = FakeClock()
+    flaky = FlakyRedis(failures=2)
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    monkeypatch.setattr(redis.Redis, "from_url", flaky)
+    connection = RedisConnection("redis://unreachable:6379/0", "test")
+
+    assert connection.get() is None
+    assert connection.get() is None
+    assert flaky.attempts == 1  # no retry before the backoff expires
+
+    clock.now += RedisConnection.RETRY_INITIAL
+    assert connection.get() is None
+    assert flaky.attempts == 2
+
+    clock.now += RedisConnection.RETRY_INITIAL  # the backoff doubled
+    assert connection.get() is None
+    assert flaky.attempts == 2
+
+    clock.now += RedisConnection.RETRY_INITIAL
+    client = connection.get()
+    assert client is not None
+    assert connection.get() is client
+    assert flaky.attempts == 3
+
+
+def test_backoff_is_capped(monkeypatch):
+    clock = FakeClock()
+    flaky = FlakyRedis(failures=100)
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    monkeypatch.setattr(redis.Redis, "from_url", flaky)
+    connection = RedisConnection("redis://unreachable:6379/0", "test")
+
+    for _ in range(20):
+        connection.get()
+        clock.now += RedisConnection.RETRY_MAX
+    assert flaky.attempts == 20
+
+
+class RecordingShared:
+    """Stands in for the Redis tier and records the thread each call runs on"""
+
+    def __init__(self):
+        self.data = {}
+        self.threads = []
+
+    def get_many(self, keys):
+        self.threads.append(threading.get_ident())
+        return {k: self.data[k] for k in keys if k in self.data}
+
+    def set_many(self, mapping):
+        self.threads.append(threading.get_ident())
+        self.data.update(mapping)
+
+    def incr_stats(self, counts):
+        self.threads.append(threading.get_ident())
+
+
+def test_async_accessors_keep_redis_off_the_event_loop():
+    tiered = TieredCache("test", local_entries=1)
+    tiered.shared = RecordingShared()
+
+    async def scenario():
+        await tiered.aset("a", b"1")
+        await tiered.aset("b", b"2")  # evicts "a" from the one-entry local tier
+        return threading.get_ident(), await tiered.aget("a")
+
+    loop_thread, value = asyncio.run(scenario())
+    assert value == b"1"
+    assert tiered.counters["shared_hits"] == 1
+    assert tiered.shared.threads
+    assert loop_thread not in tiered.shared.threads
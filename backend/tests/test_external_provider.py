@@ -0,0 +1,237 @@
+import asyncio
+import threading
+
+import pytest
+from openai import APIStatusError
+
+from app.core.provider_router import ProviderType
+from app.services.ai_detection import AIDetectionService
+
+
+def complete(router):
+    return router.chat_completion(
+        ProviderType.OPENAI,
+        model="stub",
+        messages=[{"role": "user", "content": "hello"}],
+        response_format={"type": "json_object"}
+    )
+
+
+def test_sequential_requests_reuse_one_connection(stub_provider, make_router):
+    stub = stub_provider()
+    router = make_router(stub)
+
+    async def scenario():
+        for _ in range(20):
+            await complete(router)
+        await router.aclose()
+
+    asyncio.run(scenario())
+    assert stub.requests == 20
+    assert len(stub.connections) == 1
+
+
+def test_concurrency_is_capped_and_connections_pooled(stub_provider, make_router, monkeypatch, provider_settings):
+    monkeypatch.setattr(provider_settings, "EXTERNAL_AI_MAX_CONCURRENCY", 3)
+    stub = stub_provider(latency=0.1)
+    router = make_router(stub)
+
+    async def scenario():
+        await asyncio.gather(*[complete(router) for _ in range(12)])
+        await router.aclose()
+
+    asyncio.run(scenario())
+    assert stub.requests == 12
+    assert stub.max_in_flight == 3
+    assert len(stub.connections) <= 3
+
+
+def test_429_retries_after_retry_after(stub_provider, make_router, monkeypatch, provider_settings):
+    monkeypatch.setattr(provider_settings, "EXTERNAL_AI_MAX_RETRIES", 3)
+    stub = stub_provider()
+    stub.fail_next(2, status=429, retry_after=0.2)
+    router = make_router(stub)
+
+    async def scenario():
+        response = await complete(router)
+        await router.aclose()
+        return response
+
+    response = asyncio.run(scenario())
+    assert response.choices[0].message.content
+    assert stub.statuses == [429, 429, 200]
+    gaps = [later - earlier for earlier, later in zip(stub.request_times, stub.request_times[1:])]
+    assert all(gap >= 0.2 for gap in gaps)
+    assert router.health[ProviderType.OPENAI].stats()["rate_limited"] == 2
+
+
+def test_retries_stop_after_max_retries(stub_provider, make_router, monkeypatch, provider_settings):
+    monkeypatch.setattr(provider_settings, "EXTERNAL_AI_MAX_RETRIES", 2)
+    stub = stub_provider()
+    stub.fail_next(5, status=503)
+    router = make_router(stub)
+
+    async def scenario():
+        with pytest.raises(APIStatusError):
+            await complete(router)
+        await router.aclose()
+
+    asyncio.run(scenario())
+    assert stub.requests == 3
+
+
+def test_each_event_loop_keeps_its_own_pool(stub_provider, make_router):
+    stub = stub_provider()
+    router = make_router(stub)
+    background = asyncio.new_event_loop()
+    thread = threading.Thread(target=background.run_forever, daemon=True)
+    thread.start()
+
+    def on_background(coro):
+        return asyncio.run_coroutine_threadsafe(coro, background).result(timeout=10)
+
+    try:
+        on_background(complete(router))
+
+        async def short_lived():
+            await complete(router)
+            await router.aclose()
+
+        # Another loop comes and goes without disturbing the background loop's pool
+        asyncio.run(short_lived())
+        assert [loop for _, loop in router._pools] == [background]
+        on_background(complete(router))
+        assert stub.requests == 3
+        assert len(stub.connections) == 2
+
+        on_background(router.aclose())
+        assert router._pools == {}
+    finally:
+        background.call_soon_threadsafe(background.stop)
+        thread.join()
+        background.close()
+
+
+def test_pools_of_closed_loops_are_dropped(stub_provider, make_router):
+    stub = stub_provider()
+    router = make_router(stub)
+
+    asyncio.run(complete(router))  # the loop ends without router.aclose()
+    assert len(router._pools) == 1
+
+    async def scenario():
+        await complete(router)
+        await router.aclose()
+
+    asyncio.run(scenario())
+    assert router._pools == {}
+
+
+def detection_service(router) -> AIDetectionService:
+    service = AIDetectionService(load_model=False)
+    service.router = router
+    return service
+
+
+@pytest.fixture
+def pack_settings(monkeypatch, provider_settings):
+    monkeypatch.setattr(provider_settings, "AI_PACK_MAX_ITEMS", 2)
+    monkeypatch.setattr(provider_settings, "AI_PACK_CHUNK_TOKENS", 50)
+    monkeypatch.setattr(provider_settings, "AI_PACK_MAX_CHUNKS", 8)
+    return provider_settings
+
+
+def test_packed_requests_score_every_document(stub_provider, make_router, pack_settings):
+    stub = stub_provider(score=0.75)
+    service = detection_service(make_router(stub))
+    texts = {
+        "long": "word " * 80,  # 400 characters: two 200-character chunks
+        "short": "A short text.",
+        "other": "Another short text.",
+    }
+
+    async def scenario():
+        results = await service.detect_external_packed(texts, ProviderType.OPENAI, threshold=0.5)
+        await service.router.aclose()
+        return results
+
+    results, usage = asyncio.run(scenario())
+    # Four chunks, at most two per request
+    assert stub.requests == 2
+    assert usage["requests"] == 2
+    assert usage["items"] == 4
+    assert usage["total_tokens"] > 0
+    for key in texts:
+        assert results[key]["label"] == "Likely AI"
+        assert results[key]["score"] == pytest.approx(0.75)
+        assert results[key]["details"]["packed"] is True
+    assert results["long"]["details"]["chunks_total"] == 2
+    assert results["long"]["details"]["chunks_analyzed"] == 2
+
+
+def test_packed_items_missing_from_answer_are_retried_once(stub_provider, make_router, pack_settings):
+    stub = stub_provider(score=0.3)
+    stub.drop_ids = {"1"}  # the model never answers for the long text's second chunk
+    service = detection_service(make_router(stub))
+    texts = {"long": "word " * 80, "short": "A short text."}
+
+    async def scenario():
+        results = await service.detect_external_packed(texts, ProviderType.OPENAI, threshold=0.5)
+        await service.router.aclose()
+        return results
+
+    results, usage = asyncio.run(scenario())
+    assert stub.requests == 3  # two packed requests plus one follow-up for the missing item
+    assert results["long"]["label"] == "Likely Human"
+    assert results["long"]["details"]["chunks_analyzed"] == 1
+    assert results["long"]["details"]["chunks_total"] == 2
+    assert results["short"]["score"] == pytest.approx(0.3)
+
+
+def test_packed_scores_are_clamped_and_errors_reported(stub_provider, make_router, pack_settings):
+    stub = stub_provider(score=1.7)
+    service = detection_service(make_router(stub))
+
+    async def scenario():
+        scored = await service.detect_external_packed({"a": "Some text."}, ProviderType.OPENAI, threshold=0.5)
+        stub.fail_next(10, status=500)
+        failed = await service.detect_external_packed({"b": "Other text."}, ProviderType.OPENAI, threshold=0.5)
+        await service.router.aclose()
+        return scored, failed
+
+    (scored, _), (failed, _) = asyncio.run(scenario())
+    assert scored["a"]["score"] == 1.0
+    assert failed["b"]["label"] == "Error"
+    assert "External provider error" in failed["b"]["details"]["error"]
+
+
+class RecordingCache:
+    def __init__(self):
+        self.data = {}
+        self.writes = 0
+
+    async def aget(self, key):
+        return self.data.get(key)
+
+    async def aset(self, key, value):
+        self.writes += 1
+        self.data[key] = value
+
+
+def test_packed_detection_caches_each_result_once(stub_provider, make_router, pack_settings, monkeypatch):
+    monkeypatch.setattr(pack_settings, "AI_PACKING_ENABLED", True)
+    stub = stub_provider(score=0.75)
+    service = detection_service(make_router(stub))
+    service.cache = RecordingCache()
+
+    async def scenario():
+        first = await service.detect_async("A short text.", provider="openai", threshold=0.5)
+        second = await service.detect_async("A short text.", provider="openai", threshold=0.5)
+        await service.router.aclose()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert service.cache.writes == 1
+    assert stub.requests == 1
+    assert first["details"]["cache_hit"] is False
+    assert second["details"]["cache_hit"] is True
@@ -0,0 +1,32 @@
+import asyncio
+
+from app.services.ai_detection import AIDetectionService
+from app.services.prescreen import StatisticalPrescreen
+
+FEATURES = {"words": 500, "sentences": 30, "burstiness": 0.1}
+TEXT = "Every sentence here has the same length. " * 80
+
+
+def test_verdicts_are_opt_in():
+    hint_only = StatisticalPrescreen(low=0.05, high=0.95, min_words=300, verdicts=False)
+    assert hint_only.verdict(FEATURES, 0.99, threshold=0.5) is None
+    assert hint_only.verdict(FEATURES, 0.01, threshold=0.5) is None
+
+    settling = StatisticalPrescreen(low=0.05, high=0.95, min_words=300, verdicts=True)
+    assert settling.verdict(FEATURES, 0.99, threshold=0.5) == "ai"
+    assert settling.verdict(FEATURES, 0.01, threshold=0.5) == "human"
+    assert settling.verdict(FEATURES, 0.5, threshold=0.5) is None
+
+
+def test_cascade_never_returns_an_unconfirmed_prescreen_score(monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "AI_CACHE_ENABLED", False)
+    monkeypatch.setattr(settings, "AI_CASCADE_EXTERNAL_PROVIDER", "")
+    service = AIDetectionService(load_model=False)
+    service.router.local_model_available = False
+    service.prescreen = StatisticalPrescreen(verdicts=False)
+
+    result = asyncio.run(service.detect_async(TEXT, provider="cascade", threshold=0.5))
+    assert result["label"] == "Error"
+    assert "Pre-screen not conclusive" in result["details"]["error"]
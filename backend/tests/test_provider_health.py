@@ -0,0 +1,218 @@
+import asyncio
+
+import pytest
+from openai import APIStatusError, BadRequestError
+
+from app.core.provider_router import ProviderType, ProviderUnavailableError
+from app.services.ai_detection import AIDetectionService
+
+TEXT = "A paragraph of text that is long enough to be analyzed by an external provider. " * 5
+
+
+def complete(router, provider=ProviderType.OPENAI):
+    return router.chat_completion(
+        provider,
+        model="stub",
+        messages=[{"role": "user", "content": "hello"}],
+        response_format={"type": "json_object"}
+    )
+
+
+async def trip(router, stub, failures=3):
+    stub.error_rate = 1.0
+    for _ in range(failures):
+        with pytest.raises(APIStatusError):
+            await complete(router)
+
+
+def test_breaker_trips_opens_and_closes_after_probe(stub_provider, make_router, provider_settings):
+    stub = stub_provider()
+    router = make_router(stub)
+    health = router.health[ProviderType.OPENAI]
+
+    async def scenario():
+        await trip(router, stub)
+        assert health.state == "open"
+
+        # Open: rejected without a request
+        with pytest.raises(ProviderUnavailableError):
+            await complete(router)
+        assert stub.requests == 3
+        assert health.rejected == 1
+
+        # After the cooldown a single probe goes through and closes the breaker
+        stub.error_rate = 0.0
+        await asyncio.sleep(provider_settings.AI_BREAKER_COOLDOWN)
+        await complete(router)
+        assert health.state == "closed"
+        await complete(router)
+        await router.aclose()
+
+    asyncio.run(scenario())
+    assert stub.requests == 5
+    assert health.trips == 1
+
+
+def test_failed_probe_reopens_breaker(stub_provider, make_router, provider_settings):
+    stub = stub_provider()
+    router = make_router(stub)
+    health = router.health[ProviderType.OPENAI]
+
+    async def scenario():
+        await trip(router, stub)
+        await asyncio.sleep(provider_settings.AI_BREAKER_COOLDOWN)
+        assert health.allow() and health.state == "half_open"
+        health.record(False, 0.0, 503)  # the probe failed
+        assert health.state == "open"
+        with pytest.raises(ProviderUnavailableError):
+            await complete(router)
+        await router.aclose()
+
+    asyncio.run(scenario())
+    assert health.trips == 2
+
+
+def test_cancelled_probe_does_not_strand_breaker(stub_provider, make_router, provider_settings):
+    stub = stub_provider()
+    router = make_router(stub)
+    health = router.health[ProviderType.OPENAI]
+
+    async def scenario():
+        await trip(router, stub)
+        await asyncio.sleep(provider_settings.AI_BREAKER_COOLDOWN)
+
+        # The probe is cancelled by the caller's timeout before the provider answers
+        stub.error_rate = 0.0
+        stub.latency = 0.5
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(complete(router), timeout=0.1)
+        assert health.state == "half_open"
+
+        # The next call may probe again
+        stub.latency = 0.0
+        await complete(router)
+        assert health.state == "closed"
+        await router.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_caller_errors_do_not_trip_breaker(stub_provider, make_router):
+    stub = stub_provider(error_rate=1.0, error_status=400)
+    router = make_router(stub)
+    health = router.health[ProviderType.OPENAI]
+
+    async def scenario():
+        for _ in range(6):
+            with pytest.raises(BadRequestError):
+                await complete(router)
+        await router.aclose()
+
+    asyncio.run(scenario())
+    assert health.state == "closed"
+    assert health.stats()["error_rate"] == 0.0
+    assert stub.requests == 6
+
+
+def test_caller_error_on_probe_leaves_breaker_half_open(stub_provider, make_router, provider_settings):
+    stub = stub_provider()
+    router = make_router(stub)
+    health = router.health[ProviderType.OPENAI]
+
+    async def scenario():
+        await trip(router, stub)
+        await asyncio.sleep(provider_settings.AI_BREAKER_COOLDOWN)
+
+        # A 400 on the probe says nothing about the provider: no outcome, and the slot is freed
+        stub.fail_next(1, status=400)
+        with pytest.raises(BadRequestError):
+            await complete(router)
+        assert health.state == "half_open"
+        assert health.consecutive_failures == 3
+
+        stub.error_rate = 0.0
+        await complete(router)
+        assert health.state == "closed"
+        await router.aclose()
+
+    asyncio.run(scenario())
+
+
+def detection_service(router) -> AIDetectionService:
+    service = AIDetectionService(load_model=False)
+    service.router = router
+    return service
+
+
+def test_fail_fast_returns_error_and_reroute_uses_fallback(stub_provider, make_router):
+    failing = stub_provider(error_rate=1.0)
+    healthy = stub_provider(score=0.9)
+    service = detection_service(make_router(failing, healthy))
+
+    async def scenario():
+        fail_fast = await service.detect_async(TEXT, provider="openai", threshold=0.5, policy="fail_fast")
+        rerouted = await service.detect_async(
+            TEXT, provider="openai", threshold=0.5, policy="reroute", fallback_provider="together"
+        )
+        await service.router.aclose()
+        return fail_fast, rerouted
+
+    fail_fast, rerouted = asyncio.run(scenario())
+    assert fail_fast["label"] == "Error"
+    assert healthy.requests == 1  # only the rerouted call reached the fallback
+
+    assert rerouted["label"] == "Likely AI"
+    assert rerouted["provider"] == ProviderType.TOGETHER.value
+    assert rerouted["score"] == pytest.approx(0.9)
+    assert rerouted["details"]["rerouted_from"] == ProviderType.OPENAI.value
+
+
+def test_reroute_skips_open_breaker(stub_provider, make_router):
+    failing = stub_provider()
+    healthy = stub_provider(score=0.2)
+    service = detection_service(make_router(failing, healthy))
+
+    async def scenario():
+        await trip(service.router, failing)
+        sent = failing.requests
+        result = await service.detect_async(TEXT, provider="openai", threshold=0.5, policy="reroute")
+        await service.router.aclose()
+        return sent, result
+
+    sent, result = asyncio.run(scenario())
+    assert failing.requests == sent  # the open breaker sent nothing
+    assert result["provider"] == ProviderType.TOGETHER.value
+    assert result["label"] == "Likely Human"
+
+
+def test_health_endpoint_reports_provider_state(stub_provider, make_router, monkeypatch):
+    from app.api.v1 import routes
+    from app.services import inference_queue
+
+    class IdleQueue:
+        def stats(self):
+            return {}
+
+    monkeypatch.setattr(inference_queue, "get_inference_queue", lambda: IdleQueue())
+    stub = stub_provider()
+    service = detection_service(make_router(stub))
+
+    async def scenario():
+        await complete(service.router)
+        await trip(service.router, stub)
+        response = await routes.ai_health_check(ai_service=service)
+        await service.router.aclose()
+        return response
+
+    response = asyncio.run(scenario())
+    providers = response["health"]["providers"]
+    openai = providers[ProviderType.OPENAI.value]
+    assert openai["state"] == "open"
+    assert openai["configured"] is True
+    assert openai["calls"] == 4
+    assert openai["error_rate"] == 0.75
+    assert openai["trips"] == 1
+    assert openai["consecutive_failures"] == 3
+    assert openai["latency_p50"] is not None
+    assert openai["quota"] == {"x-ratelimit-remaining-requests": "100"}
+    assert providers[ProviderType.TOGETHER.value]["state"] == "closed"
@@ -0,0 +1,81 @@
+import uuid
+import random
+import asyncio
+from types import SimpleNamespace
+
+from app.services.winnowing import WinnowingService
+
+OWNER = uuid.uuid4()
+BOILERPLATE = (
+    "Course: Introduction to Academic Writing. Instructor: Dr. Example. "
+    "Submit your essay as a single document. Late submissions lose ten percent per day. "
+)
+
+
+def prose(seed: int, words: int = 150) -> str:
+    rng = random.Random(seed)
+    return " ".join("".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 9))) for _ in range(words)) + ". "
+
+
+class Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+    def scalars(self):
+        return Result([row[0] for row in self.rows])
+
+
+class FakeSession:
+    """Answers the two fingerprint queries of find_copies from in-memory (document_id, hash, start, end) rows"""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def execute(self, statement):
+        params = statement.compile().params
+        hashes = set(next(value for value in params.values() if isinstance(value, list)))
+        matching = [row for row in self.rows if row[1] in hashes]
+        if statement._group_by_clauses:
+            documents = {}
+            for document_id, h, _, _ in matching:
+                documents.setdefault(h, set()).add(document_id)
+            threshold = statement._having_criteria[0].right.value
+            return Result([(h,) for h, ids in documents.items() if len(ids) > threshold])
+        return Result(matching)
+
+
+def corpus(texts):
+    documents = [SimpleNamespace(id=uuid.uuid4(), text_content=text) for text in texts]
+    indexer = WinnowingService(None, k=30, window=20)
+    rows = [(doc.id, h, start, end) for doc in documents for h, start, end in indexer.document_fingerprints(doc)]
+    return documents, FakeSession(rows)
+
+
+def find_copies(session, document, **kwargs):
+    service = WinnowingService(session, k=30, window=20, **kwargs)
+    return asyncio.run(service.find_copies(document, OWNER))
+
+
+def test_boilerplate_shared_by_many_documents_is_not_a_copy():
+    copied = prose(1000)
+    texts = [BOILERPLATE + prose(seed) for seed in range(25)]
+    texts[1] += copied
+    texts[2] += copied
+    documents, session = corpus(texts)
+
+    # Every document shares the header, but only the copied passage counts
+    assert find_copies(session, documents[0], max_doc_freq=20) == []
+    copies = find_copies(session, documents[1], max_doc_freq=20)
+    assert [entry["doc_b"] for entry in copies] == [str(documents[2].id)]
+
+    # Without the cap the header pairs every document with every other
+    assert len(find_copies(session, documents[0], max_doc_freq=0)) == 24
+
+
+def test_fingerprints_below_the_cap_still_match():
+    texts = [BOILERPLATE + prose(seed) for seed in range(5)]
+    documents, session = corpus(texts)
+    assert len(find_copies(session, documents[0], max_doc_freq=20)) == 4
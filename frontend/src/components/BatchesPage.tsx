@@ -12,6 +12,44 @@ type Batch = {
   created_at: string | null;
 };
 
+type BatchEvent = {
+  type: string;
+  status?: string;
+  processed_docs?: number;
+  total_docs?: number;
+};
+
+const ACTIVE_STATUSES = ['queued', 'processing'];
+
+// Reads the Server-Sent Events stream of a batch with fetch, since EventSource cannot send the auth header
+const streamBatchEvents = async (
+  batchId: string,
+  token: string | null,
+  onEvent: (event: BatchEvent) => void,
+  signal: AbortSignal,
+) => {
+  const response = await fetch(`/api/v1/batches/${batchId}/events`, {
+    headers: { 'Authorization': `Bearer ${token}` },
+    signal,
+  });
+  if (!response.ok || !response.body) return;
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const messages = buffer.split('\n\n');
+    buffer = messages.pop() || '';
+    for (const message of messages) {
+      const data = message.split('\n').find((line) => line.startsWith('data: '));
+      if (data) onEvent(JSON.parse(data.slice(6)));
+    }
+  }
+};
+
 const BatchesPage = () => {
   const [batches, setBatches] = useState<Batch[]>([]);
   const [error, setError] = useState<string | null>(null);
@@ -38,6 +76,32 @@ const BatchesPage = () => {
     fetchBatches();
   }, []);
 
+  // Live progress of running batches, pushed by the server instead of polled
+  const activeIds = batches
+    .filter((batch) => ACTIVE_STATUSES.includes(batch.status))
+    .map((batch) => batch.id)
+    .join(',');
+
+  useEffect(() => {
+    if (!activeIds) return;
+    const token = localStorage.getItem('token');
+    const controller = new AbortController();
+
+    activeIds.split(',').forEach((batchId) => {
+      streamBatchEvents(batchId, token, (event) => {
+        if (event.processed_docs === undefined && event.type !== 'batch') return;
+        setBatches((current) => current.map((batch) => batch.id !== batchId ? batch : {
+          ...batch,
+          status: event.status ?? batch.status,
+          processed_docs: event.processed_docs ?? batch.processed_docs,
+          total_docs: event.total_docs ?? batch.total_docs,
+        }));
+      }, controller.signal).catch(() => {});
+    });
+
+    return () => controller.abort();
+  }, [activeIds]);
+
   return (
     <div className="container fade-in" style={{ padding: '60px 0' }}>
       <div style={{ marginBottom: '40px' }}>